@@ -3,10 +3,12 @@
 # version 5
 
 # USAGE:
-# python3 assembler.py [--run] [input_file]
+# python3 assembler.py [--run] [--unbuffered] [--compact-arrays | --numpy-arrays]
+#                      [--mmap-arrays=min_elements [--mmap-dir=directory]] [input_file]
 
 import importlib
 import sys
+import runtime
 from bytecode import Bytecode, Compare, Instr, Label 
 
 # process command line arguments
@@ -17,6 +19,31 @@ if len(sys.argv) > 1:
     if '--run' in sys.argv:
         run = True
         sys.argv.remove('--run')
+    if '--unbuffered' in sys.argv:
+        # printf writes on every call instead of buffering the output
+        runtime.unbuffered = True
+        sys.argv.remove('--unbuffered')
+    if '--compact-arrays' in sys.argv:
+        # arrays are array('q') instead of lists
+        runtime.arrays = 'compact'
+        sys.argv.remove('--compact-arrays')
+    if '--numpy-arrays' in sys.argv:
+        # arrays are numpy int64 ndarrays and vectorized loops use them
+        try:
+            runtime.use_numpy()
+        except ImportError:
+            print('--numpy-arrays requires numpy', file=sys.stderr)
+            sys.exit(1)
+        sys.argv.remove('--numpy-arrays')
+    for arg in sys.argv[1:]:
+        if arg.startswith('--mmap-arrays='):
+            # arrays with at least this many elements are memory-mapped
+            runtime.mmap_threshold = int(arg[len('--mmap-arrays='):])
+            sys.argv.remove(arg)
+        elif arg.startswith('--mmap-dir='):
+            # back the mapped arrays with temporary files in this directory
+            runtime.mmap_dir = arg[len('--mmap-dir='):]
+            sys.argv.remove(arg)
        
 if len(sys.argv) > 1:
     sys.stdin = open(sys.argv[1], 'r', encoding='utf-8')
@@ -39,6 +66,9 @@ for line in sys.stdin:
         continue
         
     op = line.split()
+    if '"' in line or "'" in line:
+        # string constants may contain spaces
+        op = line.split(maxsplit=1)
 
     if len(op) == 1:
         # single opcode
@@ -66,14 +96,18 @@ for line in sys.stdin:
         if op[1].isdigit():
             instructions.append(Instr(op[0], int(op[1])))
         else:
-            # cleanup parameter
-            s = op[1].replace('"', '').replace('\\n', '\n').rstrip()
+            # cleanup parameter: 'text' (written by compiler.py) is kept as
+            # it is, "text" loses its trailing whitespace, print() ends the line
+            if op[1].startswith("'"):
+                s = op[1][1:-1].replace('\\n', '\n').replace('\\t', '\t')
+            else:
+                s = op[1].replace('"', '').replace('\\n', '\n').rstrip()
             if op[0] == 'COMPARE_OP':
                 if s not in comps:
                     print(f"unknown comparison operator '{s}' in line {lineno}", file=sys.stderr)
                     sys.exit(1)
                 instructions.append(Instr(op[0], comps[s]))
-            elif op[0] == 'POP_JUMP_IF_FALSE' or op[0] == 'JUMP_ABSOLUTE':
+            elif op[0] in ('POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE', 'JUMP_ABSOLUTE'):
                 # handle label usage
                 label = op[1]
                 if label not in labels:
@@ -81,6 +115,9 @@ for line in sys.stdin:
                 instructions.append(Instr(op[0], labels[label]))
             elif op[0] == '.begin':
                 # begin function declaration
+                # instructions before it (e.g. the runtime import) belong to the module
+                f_instructions.extend(instructions)
+                instructions = []
                 function_name = op[1] # save function name 
                 bytecode = Bytecode()
                 bytecode.argnames = op[2:] # list of named arguments
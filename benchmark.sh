@@ -0,0 +1,6 @@
+#!/bin/bash
+
+for filename in ./benchmark/*.c; do
+    echo "$filename"
+    time ./run.sh "$filename"
+done
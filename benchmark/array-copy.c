@@ -0,0 +1,26 @@
+// results in 5000000
+
+#include <stdio.h>
+
+int main() {
+    int n = 5000000;
+    int a[n];
+    int b[n];
+    int i = 0;
+    while (i < n) {
+        a[i] = 1;
+        i = i + 1;
+    }
+    i = 0;
+    while (i < n) {
+        b[i] = a[i];
+        i = i + 1;
+    }
+    int s = 0;
+    i = 0;
+    while (i < n) {
+        s = s + b[i];
+        i = i + 1;
+    }
+    printf("%d\n", s);
+}
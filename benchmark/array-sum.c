@@ -0,0 +1,20 @@
+// results in 150009985000000
+
+#include <stdio.h>
+
+int main() {
+    int n = 10000000;
+    int a[n];
+    int i = 0;
+    while (i < n) {
+        a[i] = i * 3 + 1000;
+        i = i + 1;
+    }
+    int s = 0;
+    i = 0;
+    while (i < n) {
+        s = s + a[i];
+        i = i + 1;
+    }
+    printf("%d\n", s);
+}
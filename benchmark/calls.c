@@ -0,0 +1,18 @@
+// results in 500000500000
+
+#include <stdio.h>
+
+int sum(int a, int b) {
+    int c = a + b;
+    return c;
+}
+
+int main() {
+    int total = 0;
+    int i = 1;
+    while (i <= 1000000) {
+        total = sum(total, i);
+        i = i + 1;
+    }
+    printf("%d\n", total);
+}
@@ -0,0 +1,16 @@
+// results in 997
+
+#include <stdio.h>
+
+int main() {
+    int a[] = {3, 1, 4, 1, 5, 9, 2, 6};
+    int s = 0;
+    int i = 0;
+    while (i < 1000000) {
+        int j = i % 8;
+        s = s + a[j] * a[j] + (i - 1) * (i - 1) - (i - 1) % 7;
+        s = s % 1000;
+        i = i + 1;
+    }
+    printf("%d\n", s);
+}
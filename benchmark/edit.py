@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# times edits of incremental.Document on the synthetic program of
+# benchmark/parse.py, against analysing the whole text again. random edits
+# of a smaller program check that the document after each edit is the one
+# analysed from scratch, with the tokens of fastcompiler.tokenize
+
+# USAGE:
+# python3 benchmark/edit.py [functions [edits [seed]]]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from parse import program
+from fastcompiler import Fallback, tokenize
+from incremental import Document
+
+PIECES = ['{', '}', '"', '\n', ' ', ';', 'x', 'int ', '// c\n', '    d[1] = c;\n',
+          '    int e = a;\n', 'int g() {\n}\n', '"x\n"']
+
+
+def random_edit(random, text):
+    # (start, end, text)
+    start = random.randrange(len(text) + 1)
+    end = min(len(text), start + random.choice([0, 0, 1, 3, 20, 400]))
+    return start, end, random.choice(PIECES) if random.random() < 0.8 else ''
+
+
+def state(document):
+    return [(unit.text, unit.lines, unit.tokens, list(unit.offsets), unit.kind, unit.tree,
+             unit.diagnostics) for unit in document.units], document.diagnostics()
+
+
+def check(functions, edits, seed):
+    generator = random.Random(seed)
+    text = program(functions)
+    document = Document(text)
+    for _ in range(edits):
+        start, end, piece = random_edit(generator, text)
+        text = text[:start] + piece + text[end:]
+        document.edit(start, end, piece)
+        if document.text != text or state(document) != state(Document(text)):
+            sys.exit(f'edit {start}:{end} {piece!r} gives another document')
+        try:
+            tokens = tokenize(text)
+        except Fallback:
+            continue
+        if list(document.tokens()) != tokens:
+            sys.exit(f'edit {start}:{end} {piece!r} gives other tokens')
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 3600
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    check(20, edits, seed)
+
+    text = program(functions)
+    start = time.perf_counter()
+    document = Document(text)
+    whole = time.perf_counter() - start
+    lines = text.count('\n')
+    print(f'{functions} functions, {lines} lines: whole text {whole * 1000:.0f} ms')
+
+    generator = random.Random(seed)
+    kinds = {'statement': [], 'character': [], 'new line': []}
+    for _ in range(edits):
+        for kind, offset, length, piece in [('statement', 0, 0, '    c = c + 1;\n'),
+                                            ('character', 8, 1, 'e'),
+                                            ('new line', 0, 0, '\n')]:
+            # in the body of a function
+            position = text.find('    int d[4];\n', generator.randrange(len(text)))
+            if position < 0:
+                position = text.index('    int d[4];\n')
+            start, end = position + offset, position + offset + length
+            began = time.perf_counter()
+            document.edit(start, end, piece)
+            kinds[kind].append(time.perf_counter() - began)
+            text = text[:start] + piece + text[end:]
+    if document.text != text:
+        sys.exit('the document is not the text edited')
+    for kind, times in kinds.items():
+        times.sort()
+        print(f'{kind:10} edit: median {times[len(times) // 2] * 1000:.2f} ms, '
+              f'max {times[-1] * 1000:.2f} ms')
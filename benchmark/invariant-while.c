@@ -0,0 +1,19 @@
+// results in 21990000000
+
+#include <stdio.h>
+
+int main() {
+    int k = 7;
+    int n = 3;
+    int total = 0;
+    int x = 0;
+    while (x < 2000) {
+        int y = 0;
+        while (y < 1000) {
+            total = total + y * (k * n + 1) + (x * k - n) % 13;
+            y = y + 1;
+        }
+        x = x + 1;
+    }
+    printf("%d\n", total);
+}
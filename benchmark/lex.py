@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# times ÇLexer on the synthetic program of benchmark/parse.py, with the
+# token-by-token tokenize() and with tokenize_all(), which lexes the whole
+# text with one regular expression search into arrays. both must give the
+# same tokens. with --names the program is mostly long identifiers
+
+# USAGE:
+# python3 benchmark/lex.py [functions [--names]]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from parse import name, program
+
+from compiler import ÇLexer
+
+
+def names_program(functions):
+    # functions adding up variables, with names starting like keywords
+    text = '#include <stdio.h>\n'
+    for n in range(functions):
+        variables = [f'{prefix}{name(n)}' for prefix in ('int', 'iff', 'wh', 'ret', 'pr', 'vo', 'ma', 'co')]
+        text += f'int {name(n)}(int {variables[0]}) {{\n'
+        for previous, variable in zip(variables, variables[1:]):
+            text += f'    int {variable} = {previous} + {previous} * {variables[0]};\n'
+        text += f'    return {variables[-1]};\n}}\n'
+    return text + 'int main() {\n}\n'
+
+
+def best_time(function, text):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def tokenize(text):
+    return list(ÇLexer().tokenize(text))
+
+
+def tokenize_all(text):
+    return ÇLexer().tokenize_all(text)
+
+
+def tokenize_all_tokens(text):
+    return list(ÇLexer().tokenize_all(text))
+
+
+def fields(tokens):
+    return [(t.type, t.value, t.lineno, t.index, t.end) for t in tokens]
+
+
+if __name__ == '__main__':
+    names = '--names' in sys.argv
+    if names:
+        sys.argv.remove('--names')
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = names_program(functions) if names else program(functions)
+    if fields(tokenize(text)) != fields(tokenize_all(text)):
+        sys.exit('tokenize() and tokenize_all() give different tokens')
+    tokens = len(tokenize_all(text))
+    print(f'{functions} functions, {len(text)} characters, {tokens} tokens')
+    for name, function in [('tokenize()', tokenize), ('tokenize_all()', tokenize_all),
+                           ('tokenize_all() + Token objects', tokenize_all_tokens)]:
+        elapsed = best_time(function, text)
+        print(f'{name:32} {elapsed:.3f}s ({tokens / elapsed:.0f} tokens/s)')
@@ -0,0 +1,17 @@
+// results in 4995000000
+
+#include <stdio.h>
+
+int main() {
+    int total = 0;
+    int x = 0;
+    while (x < 10000) {
+        int y = 0;
+        while (y < 1000) {
+            total = total + y;
+            y = y + 1;
+        }
+        x = x + 1;
+    }
+    printf("%d\n", total);
+}
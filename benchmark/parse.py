@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# times compiler.py on a synthetic program with many functions, where the
+# time goes to lexing and parsing instead of running the program, and
+# counts the tokens and the reductions (calls of grammar rules) of a parse.
+# the peak memory of the compiler is that of its largest run
+# with --fast it times fastcompiler.py instead, which has no reductions
+
+# USAGE:
+# python3 benchmark/parse.py [functions [--fast] [compiler options]]
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+LETTERS = 'abcdefghijklmnopqrsuvwxyz'  # names starting with t are not lexed well
+
+# runs compiler.py (sys.argv[1]) with the grammar rules and the tokens counted
+COUNT = '''
+import os
+import runpy
+import sys
+
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+from sly import yacc
+
+parse = yacc.Parser.parse
+counts = [0, 0]
+
+def counted(func):
+    def rule(self, p):
+        counts[1] += 1
+        return func(self, p)
+    return rule
+
+def tokens(tokens):
+    for token in tokens:
+        counts[0] += 1
+        yield token
+
+def counting_parse(self, tokens_):
+    for p in self._grammar.Productions:
+        if p.func:
+            p.func = counted(p.func)
+    result = parse(self, tokens(tokens_))
+    print(*counts, file=sys.stderr)
+    return result
+
+yacc.Parser.parse = counting_parse
+runpy.run_path(sys.argv[0], run_name='__main__')
+'''
+
+
+def name(n):
+    result = 'f'
+    while True:
+        result += LETTERS[n % len(LETTERS)]
+        n //= len(LETTERS)
+        if n == 0:
+            return result
+
+
+def function(n):
+    return f'''
+int {name(n)}(int a, int b) {{
+    int c = a * 3 + b;
+    int d[4];
+    d[1] = c % 5 - (a + 2) / 3;
+    while (c < 50) {{
+        c = c + (a - 1) * 2 + d[1];
+        if (c == 7) {{
+            break;
+        }}
+    }}
+    printf("%d %d\\n", c, d[1]);
+    return c + {name(n - 1) + '(a, b - 1)' if n else 'b'};
+}}
+'''
+
+
+def program(functions):
+    return '#include <stdio.h>\n' + ''.join(function(n) for n in range(functions)) + f'''
+int main() {{
+    printf("%d\\n", {name(functions - 1)}(1, 2));
+}}
+'''
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fast = '--fast' in sys.argv
+    if fast:
+        sys.argv.remove('--fast')
+    compiler = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                            'fastcompiler.py' if fast else 'compiler.py')
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'program.c')
+        with open(source, 'w') as f:
+            f.write(program(functions))
+        best = None
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, compiler, *sys.argv[2:], source,
+                            os.path.join(directory, 'program.pyasm')], check=True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if not fast:
+            counts = subprocess.run([sys.executable, '-c', COUNT, compiler, *sys.argv[2:], source,
+                                     os.path.join(directory, 'program.pyasm')],
+                                    check=True, capture_output=True, text=True).stderr.split()
+    lines = program(functions).count('\n')
+    print(f'{functions} functions, {lines} lines: {best:.3f}s ({lines / best:.0f} lines/s)')
+    print(f'peak memory: {resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // 1024} MB')
+    if not fast:
+        tokens, reductions = map(int, counts[-2:])
+        print(f'{tokens} tokens, {reductions} reductions ({reductions / tokens:.2f} per token)')
@@ -0,0 +1,11 @@
+// prints i and i * i for i from 0 to 499999
+
+#include <stdio.h>
+
+int main() {
+    int i = 0;
+    while (i < 500000) {
+        printf("%d: %d\n", i, i * i);
+        i = i + 1;
+    }
+}
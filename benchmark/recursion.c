@@ -0,0 +1,20 @@
+// results in 405450000
+
+#include <stdio.h>
+
+int sum(int n) {
+    if (n == 0) {
+        return 0;
+    }
+    return sum(n - 1) + n;
+}
+
+int main() {
+    int total = 0;
+    int i = 0;
+    while (i < 1000) {
+        total = total + sum(900);
+        i = i + 1;
+    }
+    printf("%d\n", total);
+}
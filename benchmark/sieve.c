@@ -0,0 +1,22 @@
+// results in 664579
+
+#include <stdio.h>
+
+int main() {
+    int n = 10000000;
+    int composite[n];
+    int count = 0;
+    int i = 2;
+    while (i < n) {
+        if (composite[i] == 0) {
+            count = count + 1;
+            int j = i * i;
+            while (j < n) {
+                composite[j] = 1;
+                j = j + i;
+            }
+        }
+        i = i + 1;
+    }
+    printf("%d\n", count);
+}
@@ -0,0 +1,15 @@
+// results in 99999999
+
+#include <stdio.h>
+
+int main() {
+    int n = 100000000;
+    int a[n];
+    int i = 0;
+    while (i < n) {
+        a[i] = i;
+        i = i + 10000000;
+    }
+    a[n - 1] = n - 1;
+    printf("%d\n", a[n - 1]);
+}
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# times building the LALR tables of a synthetic C-like grammar, much larger
+# than the Ç grammar, with levels of binary operators and kinds of
+# statements. the digest identifies the tables: it must not change when
+# the table construction is reworked
+
+# USAGE:
+# python3 benchmark/tables.py [levels [statements]]
+
+import hashlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sly import Parser
+from sly.yacc import SlyLogger
+
+
+def grammar(levels, statements):
+    tokens = ['NUM', 'NAME', 'LPAREN', 'RPAREN', 'LBRACE', 'RBRACE', 'LBRACKET', 'RBRACKET',
+              'COMMA', 'SEMI', 'ASSIGN', 'MINUS', 'STRUCT', 'RETURN']
+    tokens += [f'OP{n}' for n in range(levels)] + [f'KW{n}' for n in range(statements)]
+    rules = [
+        ("'decls decl', 'decl'", 'decls'),
+        ("'STRUCT NAME LBRACE fields RBRACE SEMI', 'NAME NAME LPAREN params RPAREN block'", 'decl'),
+        ("'fields NAME NAME SEMI', 'NAME NAME SEMI'", 'fields'),
+        ("'params COMMA NAME NAME', 'NAME NAME', ''", 'params'),
+        ("'LBRACE stmts RBRACE'", 'block'),
+        ("'stmts stmt', ''", 'stmts'),
+        ("'e0 SEMI', 'NAME ASSIGN e0 SEMI', 'RETURN e0 SEMI', 'block'", 'stmt'),
+    ]
+    for n in range(statements):
+        # every other kind of statement has a second block, as in if-else
+        second = ' KW0 block' if n % 2 else ''
+        rules.append((f"'KW{n} LPAREN args RPAREN block{second}'", 'stmt'))
+    for n in range(levels):
+        rules.append((f"'e{n} OP{n} e{n + 1}', 'e{n + 1}'", f'e{n}'))
+    rules += [
+        (f"'MINUS e{levels}', 'primary'", f'e{levels}'),
+        ("'NUM', 'NAME', 'LPAREN e0 RPAREN', 'NAME LPAREN args RPAREN', "
+         "'primary LBRACKET e0 RBRACKET'", 'primary'),
+        ("'args COMMA e0', 'e0'", 'args'),
+    ]
+    source = ['class Synthetic(Parser):',
+              f'    tokens = {{ {", ".join(map(repr, tokens))} }}',
+              '    log = SlyLogger(io.StringIO())']
+    for productions, name in rules:
+        source += [f'    @_({productions})', f'    def {name}(self, p):', '        return p[0]']
+    return '\n'.join(source) + '\n'
+
+
+def digest(parser):
+    tables = parser._lrtable
+    text = repr([sorted(tables.lr_action[s].items(), key=repr) for s in sorted(tables.lr_action)])
+    text += repr([sorted(tables.lr_goto[s].items()) for s in sorted(tables.lr_goto)])
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+if __name__ == '__main__':
+    levels = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    statements = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    source = grammar(levels, statements)
+    best = None
+    for _ in range(3):
+        names = {'Parser': Parser, 'SlyLogger': SlyLogger, 'io': io}
+        start = time.perf_counter()
+        exec(source, names)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    parser = names['Synthetic']
+    print(f'{len(parser._grammar.Productions)} rules, {len(parser._lrtable.lr_action)} states: '
+          f'{best:.3f}s (tables {digest(parser)})')
@@ -0,0 +1,33 @@
+// results in 14000003000000
+
+#include <stdio.h>
+
+int main() {
+    int n = 2000000;
+    int a[n];
+    int b[n];
+    int c[n];
+    int k = 3;
+    int i = 0;
+    while (i < n) {
+        b[i] = i * 2;
+        c[i] = i + 5;
+        i = i + 1;
+    }
+    int r = 0;
+    while (r < 5) {
+        i = 0;
+        while (i < n) {
+            a[i] = b[i] * k + c[i];
+            i = i + 1;
+        }
+        r = r + 1;
+    }
+    int s = 0;
+    i = 0;
+    while (i < n) {
+        s = s + a[i];
+        i = i + 1;
+    }
+    printf("%d\n", s);
+}
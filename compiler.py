@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 
 # USAGE:
-# python3 compiler.py [input_file [output_file]]
+# python3 compiler.py [-O] [--inline=max_instructions] [--bounds-check]
+#                     [--precompute[=max_instructions]] [input_file [output_file]]
 
 import sys
 from sly import Lexer, Parser
+import frontend
+import interpreter
+import optimizer
 
 #################### LEXER ####################
 
@@ -14,20 +18,22 @@ class ÇLexer(Lexer):
     literals = {';', '+', '-', '*', '/', '(', ')', '{', '}', ',', '=', '%', '[', ']'}
     tokens = {STDIO, INT, MAIN, PRINTF, STRING, NUMBER, NAME, IF, COMP, WHILE, BREAKCONTINUE, VOID, RETURN}
     STDIO   = '#include <stdio.h>'
-    INT     = 'int'
-    MAIN    = 'main'
-    PRINTF  = 'printf'
     STRING  = r'"[^"]*"'
     NUMBER  = r'\d+'
-    IF  = 'if'
     COMP = r'(==|!=|<=|>=|<|>)'
-    WHILE = 'while'
-    BREAKCONTINUE = r'(break|continue)'
-    VOID = 'void'
-    RETURN = 'return'
 
-    # Deixar por último para não conflitar com as palavras reservadas
+    # reserved words are names looked up in a table, so that a name only
+    # starting with one (integer, iffy) is still a name
     NAME    = r'[a-z]+'
+    NAME['int'] = INT
+    NAME['main'] = MAIN
+    NAME['printf'] = PRINTF
+    NAME['if'] = IF
+    NAME['while'] = WHILE
+    NAME['break'] = BREAKCONTINUE
+    NAME['continue'] = BREAKCONTINUE
+    NAME['void'] = VOID
+    NAME['return'] = RETURN
 
     # ignored characters and patterns
     ignore = r' \t'
@@ -45,14 +51,30 @@ class ÇLexer(Lexer):
 
 #################### PARSER ####################
 
-class ÇParser(Parser):
+class ÇParser(Parser, frontend.Printf):
     tokens = ÇLexer.tokens
 
+    precedence = (
+        ('left', '+', '-'),
+        ('left', '*', '/', '%'),
+    )
+
+    # rules like expression : call only pass their symbol on
+    skip_unit_rules = True
+
     RED = '\033[91m'
     YELLOW = '\033[93m'
     END = '\033[0m'
 
-    def __init__(self):
+    def __init__(self, optimize=False, bounds_check=False, fuel=None):
+        # emitted instructions not yet written out
+        self.code = []
+        self.optimize = optimize
+        self.bounds_check = bounds_check
+        # with fuel the whole program is kept and run by interpreter.py
+        self.fuel = fuel
+        self.program_code = []
+
         self.symbols_table = []
         self.used_vars = []
         self.type_vars = []
@@ -64,10 +86,26 @@ class ÇParser(Parser):
         # while statements
         self.while_count = 1
         self.while_labels = []
+        self.while_starts = []
+        self.while_conds = []
 
         # array
         self.num_elements = 0
 
+    # output methods
+    def emit(self, *args):
+        self.code.append(' '.join(str(arg) for arg in args))
+
+    def flush(self):
+        if self.optimize:
+            self.code = optimizer.optimize(self.code)
+        if self.fuel is not None:
+            self.program_code.extend(self.code)
+        else:
+            for line in self.code:
+                print(line)
+        self.code = []
+
     # error handling method
     def show_error(self, mesg, line=None):
         if line:
@@ -84,53 +122,60 @@ class ÇParser(Parser):
     
     # ---------------- program ----------------
 
-    @_('stdio functions')
+    @_('stdio functions main')
     def program(self, p):
-        print('\n# symbols table:', self.symbols_table)
-        print('\n# used variables:', self.used_vars)
+        self.emit('\n# symbols table:', self.symbols_table)
+        self.emit('\n# used variables:', self.used_vars)
         unusued_vars = [var for var, used in zip(self.symbols_table, self.used_vars) if not used]
         if unusued_vars:
             for var in unusued_vars:
                 self.show_warning(f'{var} is defined but never used')
+        self.flush()
+        if self.fuel is not None:
+            for line in interpreter.precompute(self.program_code, self.fuel):
+                print(line)
 
     @_('STDIO')
     def stdio(self, p):
-        print("# include <stdio.h>")
-        print('LOAD_CONST 0')
-        print('LOAD_CONST None')
-        print('IMPORT_NAME runtime')
-        print('IMPORT_STAR')
-        print()
+        self.emit("# include <stdio.h>")
+        self.emit('LOAD_CONST 0')
+        self.emit('LOAD_CONST None')
+        self.emit('IMPORT_NAME runtime')
+        self.emit('IMPORT_STAR')
+        self.emit()
 
     # ---------------- functions --------------
 
-    @_('function functions')
+    # left recursive, so that a function written out leaves nothing on
+    # the parser stack
+
+    @_('functions function')
     def functions(self, p):
         pass
 
-    @_('main')
+    @_('')
     def functions(self, p):
         pass
 
     @_('NAME "(" parameters ")"' )
     def function_name(self,p):
-        print("# void", p.NAME, "(){}")
-        print('.begin', p.NAME, p.parameters)
+        self.emit("# void", p.NAME, "(){}")
+        self.emit('.begin', p.NAME, p.parameters)
         # Adicionar nome dos parametros na tabela de simbolos
         for param in p.parameters.split():
             self.symbols_table.append(param)
             self.used_vars.append(False)
             self.type_vars.append('int')
-            print("# param", param)
-        print()
+            self.emit("# param", param)
+        self.emit()
 
     @_('VOID function_name "{" statements "}"')
     def function(self, p):
-        print('LOAD_CONST None')
-        print('RETURN_VALUE')
-        print('.end ')
-        print('# symbols table:', self.symbols_table)
-        print('# used variables:', self.used_vars)
+        self.emit('LOAD_CONST None')
+        self.emit('RETURN_VALUE')
+        self.emit('.end ')
+        self.emit('# symbols table:', self.symbols_table)
+        self.emit('# used variables:', self.used_vars)
         unusued_vars = [var for var, used in zip(self.symbols_table, self.used_vars) if not used]
         if unusued_vars:
             for var in unusued_vars:
@@ -138,13 +183,14 @@ class ÇParser(Parser):
         self.symbols_table = []
         self.used_vars = []
         self.type_vars = []
-        print()
+        self.emit()
+        self.flush()
     
     @_('INT function_name "{" statements "}"')
     def function(self, p):
-        print('.end ')
-        print('# symbols table:', self.symbols_table)
-        print('# used variables:', self.used_vars)
+        self.emit('.end ')
+        self.emit('# symbols table:', self.symbols_table)
+        self.emit('# used variables:', self.used_vars)
         unusued_vars = [var for var, used in zip(self.symbols_table, self.used_vars) if not used]
         if unusued_vars:
             for var in unusued_vars:
@@ -152,11 +198,12 @@ class ÇParser(Parser):
         self.symbols_table = []
         self.used_vars = []
         self.type_vars = []
-        print()
+        self.emit()
+        self.flush()
     
     @_('RETURN expression ";"')
     def return_st(self, p):
-        print('RETURN_VALUE')
+        self.emit('RETURN_VALUE')
 
     # ---------------- parameters --------------
 
@@ -178,8 +225,8 @@ class ÇParser(Parser):
 
     @_('INT MAIN "(" ")" "{" statements "}"')
     def main(self, p):
-        print('LOAD_CONST None')
-        print('RETURN_VALUE')
+        self.emit('LOAD_CONST None')
+        self.emit('RETURN_VALUE')
         
     # ---------------- statements ----------------
 
@@ -204,44 +251,44 @@ class ÇParser(Parser):
 
     @_('while_st')
     def statement(self, p):
-        print()
+        self.emit()
     
     @_('while_break_continue')
     def statement(self, p):
-        print()
+        self.emit()
 
     @_('if_st')
     def statement(self, p):
-        print()
+        self.emit()
 
     @_('printf')
     def statement(self, p):
-        print()
+        self.emit()
 
     @_('declaration')
     def statement(self, p):
-        print()
+        self.emit()
 
     @_('attribution')
     def statement(self, p):
-        print()
+        self.emit()
     
     @_('call ";"')
     def statement(self, p):
-        print()
+        self.emit()
     
     # ---------------- call ----------------
 
     @_('NAME')
     def init_call(self, p):
-        print('# name(arguments);')
-        print('LOAD_NAME', p.NAME)
+        self.emit('# name(arguments);')
+        self.emit('LOAD_GLOBAL', p.NAME)  # funções ficam no dicionário global do módulo
 
     @_('init_call "(" arguments ")"')
     def call(self, p):
-        print('#', p.arguments)
-        print('CALL_FUNCTION', p.arguments)
-        print()
+        self.emit('#', p.arguments)
+        self.emit('CALL_FUNCTION', p.arguments)
+        self.emit()
 
     # ---------------- arguments ----------------
 
@@ -269,16 +316,21 @@ class ÇParser(Parser):
         if (self.while_labels == []):
             self.show_error(f'"{p.BREAKCONTINUE}" outside of loop', p.lineno)
         elif (p.BREAKCONTINUE == 'break'):
-            print(f'JUMP_ABSOLUTE NOT_WHILE_{self.while_labels[-1]}')
+            self.emit(f'JUMP_ABSOLUTE NOT_WHILE_{self.while_labels[-1]}')
         else:
-            print(f'JUMP_ABSOLUTE WHILE_{self.while_labels[-1]}')
+            self.emit(f'JUMP_ABSOLUTE WHILE_{self.while_labels[-1]}')
 
     # ---------------- while_comp ----------------
 
+    # the test is emitted once as a guard before the loop and copied again
+    # after the body, so each iteration takes a single conditional jump
+
     @_(' while_start expression COMP expression')
     def while_comp(self, p):
-        print('COMPARE_OP', p.COMP)
-        print(f'POP_JUMP_IF_FALSE NOT_WHILE_{self.while_count}')
+        self.emit('COMPARE_OP', p.COMP)
+        self.while_conds.append(self.code[self.while_starts.pop(-1):])
+        self.emit(f'POP_JUMP_IF_FALSE NOT_WHILE_{self.while_count}')
+        self.emit(f'DO_WHILE_{self.while_count}:')
         self.while_labels.append(self.while_count)
         self.while_count += 1
 
@@ -286,15 +338,17 @@ class ÇParser(Parser):
 
     @_('')
     def while_start(self, p):
-        print(f'WHILE_{self.while_count}:')  # imprime o identificador no início do bloco while
+        self.while_starts.append(len(self.code))  # início do teste do while
     
     # ---------------- end_while ----------------
 
     @_('')
     def end_while(self, p):
         label = self.while_labels.pop(-1)
-        print(f'JUMP_ABSOLUTE WHILE_{label}')
-        print(f'NOT_WHILE_{label}:')  #FR imprime o identificador no final do bloco while
+        self.emit(f'WHILE_{label}:')  # alvo do continue
+        self.code.extend(self.while_conds.pop(-1))
+        self.emit(f'POP_JUMP_IF_TRUE DO_WHILE_{label}')
+        self.emit(f'NOT_WHILE_{label}:')  #FR imprime o identificador no final do bloco while
 
     # ---------------- if_st ----------------
 
@@ -306,8 +360,8 @@ class ÇParser(Parser):
 
     @_('expression COMP expression')
     def if_comp(self, p):
-        print('COMPARE_OP', p.COMP)
-        print(f'POP_JUMP_IF_FALSE NOT_IF_{self.if_count}')
+        self.emit('COMPARE_OP', p.COMP)
+        self.emit(f'POP_JUMP_IF_FALSE NOT_IF_{self.if_count}')
         self.if_labels.append(self.if_count)
         self.if_count += 1
 
@@ -316,22 +370,29 @@ class ÇParser(Parser):
     @_('')
     def end_if(self, p):
         label = self.if_labels.pop(-1)
-        print(f'NOT_IF_{label}:')  # imprime o identificador no final do bloco if
+        self.emit(f'NOT_IF_{label}:')  # imprime o identificador no final do bloco if
 
     # ---------------- printf ----------------
 
+    # lowered by frontend.Printf
+
     @_('STRING')
     def printf_format(self, p):
-        print("# printf(", p.STRING, ")")
-        print('LOAD_GLOBAL', 'print')
-        print('LOAD_CONST', p.STRING)
+        self.printf_pieces, self.printf_strings = self.emit_printf_format(p.STRING, p.lineno)
 
-    @_('PRINTF "(" printf_format "," expression ")" ";"')
+    @_('PRINTF "(" printf_format printf_arguments ")" ";"')
     def printf(self, p):
-        print('BINARY_MODULO')
-        print('CALL_FUNCTION', 1)
-        print('POP_TOP')
+        self.emit_printf_call(self.printf_pieces, p.printf_arguments, self.printf_strings, p.lineno)
 
+    @_('')
+    def printf_arguments(self, p):
+        return 0
+
+    @_('printf_arguments "," expression')
+    def printf_arguments(self, p):
+        index = p.printf_arguments + 1
+        self.printf_strings += self.emit_printf_argument(self.printf_pieces, index, p.lineno)
+        return index
 
     # ---------------- load_array ----------------
 
@@ -341,7 +402,8 @@ class ÇParser(Parser):
             self.show_error(f"unknown variable '{p.NAME}'", p.lineno)
         if (self.type_vars[self.symbols_table.index(p.NAME)] != 'array'):
             self.show_error(f"'{p.NAME}' is not an array", p.lineno)
-        print('LOAD_FAST', p.NAME)
+        self.emit('LOAD_FAST', p.NAME)
+        self.emit_check_index(p.NAME)
 
     # ---------------- declaration ----------------
     
@@ -352,20 +414,25 @@ class ÇParser(Parser):
         self.symbols_table.append(p.NAME)
         self.used_vars.append(False)
         self.type_vars.append('int')
-        print('STORE_FAST', p.NAME)
+        self.emit('STORE_FAST', p.NAME)
     
     # declaration of an array
-    @_('INT NAME "[" "]" "=" "{" expressions "}" ";"')
+    @_('INT NAME "[" "]" "=" "{" array_init expressions "}" ";"')
     def declaration(self, p):
         if (p.NAME in self.symbols_table):
             self.show_error(f"cannot redeclare variable '{p.NAME}'", p.lineno)
         self.symbols_table.append(p.NAME)
         self.used_vars.append(False)
         self.type_vars.append('array')
-        print("#", p.NAME, p.expressions)
-        print('BUILD_LIST', self.num_elements)
+        self.emit("#", p.NAME, p.expressions)
+        self.emit('BUILD_LIST', self.num_elements)
         self.num_elements = 0
-        print('STORE_FAST', p.NAME)
+        self.emit('CALL_FUNCTION', 1)
+        self.emit('STORE_FAST', p.NAME)
+
+    @_('')
+    def array_init(self, p):
+        self.emit("LOAD_GLOBAL array_of")
 
     # ---------------- declaration empty array ----------------
 
@@ -376,12 +443,12 @@ class ÇParser(Parser):
         self.symbols_table.append(p.NAME)
         self.used_vars.append(False)
         self.type_vars.append('array')
-        print('CALL_FUNCTION', 1)
-        print('STORE_FAST', p.NAME)
+        self.emit('CALL_FUNCTION', 1)
+        self.emit('STORE_FAST', p.NAME)
     
     @_('')
     def array_size(self, p):
-        print("LOAD_NAME array_zero")
+        self.emit("LOAD_GLOBAL array_zero")
 
     # ---------------- expressions ----------------
 
@@ -404,63 +471,59 @@ class ÇParser(Parser):
             self.show_error(f"unknown variable '{p.NAME}'", p.lineno)
         if (self.type_vars[self.symbols_table.index(p.NAME)] == 'array'):
             self.show_error(f"'{p.NAME}' is not an int", p.lineno)
-        print('STORE_FAST', p.NAME)
+        self.emit('STORE_FAST', p.NAME)
 
-    @_('load_array "[" expression "]" "=" expression ";"')
+    @_('load_array "[" array_index "]" "=" expression ";"')
     def attribution(self, p):
-        print('ROT_THREE')
-        print("STORE_SUBSCR")
+        self.emit('ROT_THREE')
+        self.emit("STORE_SUBSCR")
+
+    @_('expression')
+    def array_index(self, p):
+        if self.bounds_check:
+            self.emit('CALL_FUNCTION', 2)
 
     # ---------------- expression ----------------
 
-    @_('expression "+" term')
-    def expression(self, p):
-        print('BINARY_ADD')
+    # a single nonterminal for all expressions: the precedence table
+    # groups the operators, so a bare NAME or NUMBER is one reduction
 
-    @_('expression "-" term')
+    @_('expression "+" expression')
     def expression(self, p):
-        print('BINARY_SUBTRACT')
+        self.emit('BINARY_ADD')
 
-    @_('term')
+    @_('expression "-" expression')
     def expression(self, p):
-        pass
-
-    # ---------------- term ----------------
-
-    @_('term "*" factor')
-    def term(self, p):
-        print('BINARY_MULTIPLY')
+        self.emit('BINARY_SUBTRACT')
 
-    @_('term "/" factor')
-    def term(self, p):
-        print('BINARY_FLOOR_DIVIDE')
-
-    @_('term "%" factor')  # nova regra para o operador de módulo
-    def term(self, p):
-        print('BINARY_MODULO')
+    @_('expression "*" expression')
+    def expression(self, p):
+        self.emit('BINARY_MULTIPLY')
 
-    @_('factor')
-    def term(self, p):
-        pass
+    @_('expression "/" expression')
+    def expression(self, p):
+        self.emit('BINARY_FLOOR_DIVIDE')
 
-    # ---------------- factor ----------------
+    @_('expression "%" expression')  # nova regra para o operador de módulo
+    def expression(self, p):
+        self.emit('BINARY_MODULO')
 
     @_('NUMBER')
-    def factor(self, p):
-        print('LOAD_CONST', p.NUMBER)
+    def expression(self, p):
+        self.emit('LOAD_CONST', p.NUMBER)
 
     @_('"(" expression ")"')
-    def factor(self, p):
+    def expression(self, p):
         pass
 
     @_('NAME')
-    def factor(self, p):
+    def expression(self, p):
         if (p.NAME not in self.symbols_table):
             self.show_error(f"unknown variable '{p.NAME}'", p.lineno)
         if (self.type_vars[self.symbols_table.index(p.NAME)] == 'array'):
             self.show_error(f"'{p.NAME}' is not an int", p.lineno)
         self.used_vars[self.symbols_table.index(p.NAME)] = True
-        print('LOAD_FAST', p.NAME)
+        self.emit('LOAD_FAST', p.NAME)
 
     @_('NAME')
     def array_factor(self, p):
@@ -470,26 +533,43 @@ class ÇParser(Parser):
             self.show_error(f"'{p.NAME}' is not an array", p.lineno)
         
         self.used_vars[self.symbols_table.index(p.NAME)] = True
-        print('LOAD_FAST', p.NAME)
+        self.emit('LOAD_FAST', p.NAME)
+        self.emit_check_index(p.NAME)
 
     @_('array_factor "[" expression "]"')
-    def factor(self, p):
-        print("BINARY_SUBSCR")
+    def expression(self, p):
+        if self.bounds_check:
+            self.emit('CALL_FUNCTION', 2)
+        self.emit("BINARY_SUBSCR")
+
+    # with --bounds-check the index goes through runtime.check_index(array, index),
+    # which the optimizer removes where the index is known to be in range
+    def emit_check_index(self, name):
+        if self.bounds_check:
+            self.emit('LOAD_GLOBAL check_index')
+            self.emit('LOAD_FAST', name)
 
     @_('call')
-    def factor(self, p):
+    def expression(self, p):
         pass
 
 #################### MAIN ####################
 
-lexer = ÇLexer()
-parser = ÇParser()
+# characters of input read at a time
+BLOCK_SIZE = 1 << 20
 
-if len(sys.argv) > 1:
-    sys.stdin = open(sys.argv[1], 'r')
-    
-    if len(sys.argv) > 2:
-        sys.stdout = open(sys.argv[2], 'w')
+if __name__ == '__main__':
+    optimize, bounds_check, fuel = frontend.options()
+
+    lexer = ÇLexer()
+    parser = ÇParser(optimize, bounds_check, fuel)
+
+    if len(sys.argv) > 1:
+        sys.stdin = open(sys.argv[1], 'r')
+
+        if len(sys.argv) > 2:
+            sys.stdout = open(sys.argv[2], 'w')
 
-text = sys.stdin.read()
-parser.parse(lexer.tokenize(text))
+    # the input is read and lexed in blocks, and each function is written
+    # out when it ends, so only the function being compiled is kept
+    parser.parse(lexer.tokenize_stream(iter(lambda: sys.stdin.read(BLOCK_SIZE), '')))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# compares the two front ends, compiler.py and fastcompiler.py: the
+# instructions, messages and exit status must be the same for the programs
+# in teste/ and the other examples, and for random programs. most random
+# programs are correct; the others have an error of the kinds the compiler
+# reports (a misspelled name, a missing token...)
+
+# USAGE:
+# python3 difftest.py [programs [seed]]
+
+import glob
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+FLAGS = [[], ['-O'], ['--bounds-check']]
+# --precompute only for the examples: random programs may compute huge numbers
+EXAMPLE_FLAGS = FLAGS + [['--precompute']]
+
+KEYWORDS = ('int', 'main', 'printf', 'if', 'while', 'break', 'continue', 'void', 'return')
+FORMATS = ['%d', '%5d', '%-4d', '%+d', '%x', '%05X', '%o', '%%', '%u', '%i', '%+u', '%#o']
+
+
+class Generator:
+    # random Ç programs
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        # names are read badly when they start with t
+        self.letters = 'abcdefghijklmnopqrstuvwxyz' if self.random.random() < 0.1 \
+            else 'abcdefghijklmnopqrsuvwxyz'
+        self.functions = []
+
+    def chance(self, p):
+        return self.random.random() < p
+
+    def name(self):
+        while True:
+            name = ''.join(self.random.choice(self.letters) for _ in range(self.random.randint(1, 3)))
+            if self.chance(0.1):
+                # a name starting with a keyword is still a name
+                name = self.random.choice(KEYWORDS) + name
+            if name not in KEYWORDS:
+                return name
+
+    def fresh(self, variables):
+        while True:
+            name = self.name()
+            if name not in variables or self.chance(0.01):
+                return name
+
+    def program(self):
+        text = '#include <stdio.h>\n'
+        for _ in range(self.random.randint(0, 4)):
+            text += self.function(0)
+        variables = {}
+        text += 'int main() {\n' + self.statements(variables, 1, False, 6) + '}\n'
+        if self.chance(0.15):
+            text = self.mutate(text)
+        return text
+
+    def function(self, indent):
+        name = self.fresh(dict(self.functions))
+        parameters = [self.fresh({}) for _ in range(self.random.randint(0, 3))]
+        parameters = list(dict.fromkeys(parameters))
+        variables = dict.fromkeys(parameters, 'int')
+        kind = self.random.choice(['void', 'int'])
+        trailing = ',' if parameters and self.chance(0.05) else ''
+        text = '    ' * indent + f'{kind} {name}(' + ', '.join(f'int {p}' for p in parameters)
+        text += trailing + ') {\n' + self.statements(variables, indent + 1, False, 5)
+        if kind == 'int' or self.chance(0.2):
+            text += '    ' * (indent + 1) + f'return {self.expression(variables, 2)};\n'
+        elif indent == 0 and self.chance(0.1):
+            text += self.function(indent + 1)
+        self.functions.append((name, len(parameters)))
+        return text + '    ' * indent + '}\n'
+
+    def statements(self, variables, indent, loop, count):
+        return ''.join(self.statement(variables, indent, loop)
+                       for _ in range(self.random.randint(0, count)))
+
+    def statement(self, variables, indent, loop):
+        space = '    ' * indent
+        kind = self.random.random()
+        ints = [v for v, k in variables.items() if k == 'int']
+        arrays = [v for v, k in variables.items() if k == 'array']
+        if kind < 0.2:
+            name = self.fresh(variables)
+            text = f'{space}int {name} = {self.expression(variables, 3)};\n'
+            variables[name] = 'int'
+        elif kind < 0.3:
+            name = self.fresh(variables)
+            if self.chance(0.5):
+                values = [self.expression(variables, 2) for _ in range(self.random.randint(1, 4))]
+                text = f'{space}int {name}[] = {{{", ".join(values)}}};\n'
+            else:
+                text = f'{space}int {name}[{self.random.randint(1, 9)}];\n'
+            variables[name] = 'array'
+        elif kind < 0.45 and ints:
+            text = f'{space}{self.random.choice(ints)} = {self.expression(variables, 3)};\n'
+        elif kind < 0.5 and arrays:
+            text = f'{space}{self.random.choice(arrays)}[{self.expression(variables, 1)}] = ' \
+                   f'{self.expression(variables, 2)};\n'
+        elif kind < 0.65:
+            conversions = [self.random.choice(FORMATS) for _ in range(self.random.randint(0, 3))]
+            if self.chance(0.01):
+                conversions.append('%q')
+            words = [self.name() for _ in conversions]
+            fmt = ''.join(w + ' ' + c for w, c in zip(words, conversions)) + ' end\\n'
+            count = sum(c != '%%' for c in conversions) + self.random.choice([0] * 50 + [-1, 1])
+            arguments = ''.join(', ' + self.expression(variables, 2) for _ in range(max(count, 0)))
+            text = f'{space}printf("{fmt}"{arguments});\n'
+        elif kind < 0.75:
+            text = f'{space}while ({self.condition(variables)}) {{\n'
+            text += self.statements(variables, indent + 1, True, 3) + f'{space}}}\n'
+        elif kind < 0.85:
+            text = f'{space}if ({self.condition(variables)}) {{\n'
+            text += self.statements(variables, indent + 1, loop, 3) + f'{space}}}\n'
+        elif kind < 0.9 and (loop or self.chance(0.05)):
+            text = f'{space}{self.random.choice(["break", "continue"])};\n'
+        elif kind < 0.95 and self.functions:
+            text = f'{space}{self.call(variables, 1)};\n'
+        else:
+            name = self.fresh(variables)
+            text = f'{space}int {name} = {self.random.randint(0, 99)};\n'
+            variables[name] = 'int'
+        return text
+
+    def condition(self, variables):
+        comp = self.random.choice(['==', '!=', '<', '<=', '>', '>='])
+        return f'{self.expression(variables, 2)} {comp} {self.expression(variables, 2)}'
+
+    def call(self, variables, depth):
+        name, count = self.random.choice(self.functions)
+        count += self.random.choice([0] * 50 + [1])
+        arguments = [self.expression(variables, depth - 1) for _ in range(count)]
+        trailing = ',' if arguments and self.chance(0.05) else ''
+        return f'{name}({", ".join(arguments)}{trailing})'
+
+    def expression(self, variables, depth):
+        ints = [v for v, k in variables.items() if k == 'int']
+        arrays = [v for v, k in variables.items() if k == 'array']
+        kind = self.random.random()
+        if depth <= 0 or kind < 0.3:
+            if ints and self.chance(0.6):
+                return self.random.choice(ints)
+            if self.chance(0.01):
+                return self.name()
+            return str(self.random.randint(0, 20))
+        if kind < 0.4 and arrays:
+            return f'{self.random.choice(arrays)}[{self.expression(variables, depth - 1)}]'
+        if kind < 0.45 and self.functions:
+            return self.call(variables, depth)
+        if kind < 0.55:
+            return f'({self.expression(variables, depth - 1)})'
+        op = self.random.choice('+-*/%')
+        return f'{self.expression(variables, depth - 1)} {op} {self.expression(variables, depth - 1)}'
+
+    def mutate(self, text):
+        # a syntax or lexical error, most of the time
+        position = self.random.randrange(len(text))
+        if self.chance(0.5):
+            return text[:position] + text[position + 1:]
+        return text[:position] + self.random.choice(';,(){}[]=+int@\t') + text[position:]
+
+
+def compile(front_end, flags, source):
+    result = subprocess.run([sys.executable, os.path.join(DIRECTORY, front_end), *flags, source],
+                            capture_output=True, text=True)
+    return result.stdout, result.stderr, result.returncode
+
+
+def compare(source, flag_sets):
+    # the flags with different results
+    return [flags for flags in flag_sets
+            if compile('compiler.py', flags, source) != compile('fastcompiler.py', flags, source)]
+
+
+if __name__ == '__main__':
+    programs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    failures = 0
+    sources = sorted(glob.glob(os.path.join(DIRECTORY, '*.c')) + glob.glob(os.path.join(DIRECTORY, '*', '*.c')))
+    for source in sources:
+        for flags in compare(source, EXAMPLE_FLAGS):
+            print('different:', os.path.relpath(source, DIRECTORY), *flags)
+            failures += 1
+    with tempfile.TemporaryDirectory() as directory:
+        for n in range(seed, seed + programs):
+            source = os.path.join(directory, f'random{n}.c')
+            with open(source, 'w') as f:
+                f.write(Generator(n).program())
+            for flags in compare(source, FLAGS):
+                print(f'different: random program {n}', *flags)
+                failures += 1
+    print(f'{len(sources)} examples, {programs} random programs: {failures} differences')
+    sys.exit(1 if failures else 0)
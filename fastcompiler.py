@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+
+# a second front end for compiler.py without sly: a hand-written lexer, a
+# recursive descent parser building a tree and a code generator walking
+# it. the instructions, messages and exit status are those of compiler.py
+# (difftest.py compares both); input with an illegal character or a syntax
+# error is given to compiler.py, which reports it
+
+# USAGE:
+# python3 fastcompiler.py [-O] [--inline=max_instructions] [--bounds-check]
+#                         [--precompute[=max_instructions]] [input_file [output_file]]
+
+import gc
+import io
+import os
+import re
+import runpy
+import sys
+import frontend
+import optimizer
+
+#################### LEXER ####################
+
+# the rules of ÇLexer, in the same order
+TOKENS = [
+    ('STDIO', '#include <stdio.h>'),
+    ('STRING', r'"[^"]*"'),
+    ('NUMBER', r'\d+'),
+    ('COMP', r'(==|!=|<=|>=|<|>)'),
+    ('NAME', r'[a-z]+'),
+    ('newline', r'\n+'),
+    ('comment', r'//[^\n]*'),
+]
+
+# and its remapping of names
+KEYWORDS = {
+    'int': 'INT',
+    'main': 'MAIN',
+    'printf': 'PRINTF',
+    'if': 'IF',
+    'while': 'WHILE',
+    'break': 'BREAKCONTINUE',
+    'continue': 'BREAKCONTINUE',
+    'void': 'VOID',
+    'return': 'RETURN',
+}
+
+IGNORE = r' \t'
+LITERALS = {';', '+', '-', '*', '/', '(', ')', '{', '}', ',', '=', '%', '[', ']'}
+
+# one match for every piece of the input: ÇLexer skips the ignored
+# characters before trying its rules, and takes a literal or reports an
+# illegal character when none of them matches
+RULES = ([('ignore', f'[{re.escape(IGNORE)}]+')] + TOKENS
+         + [('literal', f'[{re.escape("".join(sorted(LITERALS)))}]'), ('error', r'[\s\S]')])
+KIND_RE = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in RULES))
+# the same without groups, which findall matches several times faster
+SCAN_RE = re.compile(re.sub(r'(?<!\\)\((?!\?)', '(?:', '|'.join(f'({pattern})' for name, pattern in RULES)))
+
+
+class Fallback(Exception):
+    # input left to compiler.py
+    pass
+
+
+def tokenize(text):
+    # [(type, value, lineno)] as ÇLexer yields them. each piece of the
+    # input is classified once, by the rule it matches on its own: the
+    # rule it matched in the input, as no rule looks ahead
+    tokens = []
+    append = tokens.append
+    lineno = 1
+    kinds = {}
+    for value in SCAN_RE.findall(text):
+        kind = kinds.get(value)
+        if kind is None:
+            kind = KIND_RE.match(value).lastgroup
+            if kind == 'literal':
+                kind = value
+            elif kind == 'NAME':
+                kind = KEYWORDS.get(value, kind)
+            kinds[value] = kind
+        if kind == 'ignore' or kind == 'comment':
+            continue
+        if kind == 'newline':
+            lineno += len(value)
+        elif kind == 'error':
+            raise Fallback()
+        else:
+            append((kind, value, lineno))
+    return tokens
+
+#################### PARSER ####################
+
+# statements are tuples named after the method generating them, the first
+# element; the same for expressions, generated by ÇGenerator.expression
+
+class ÇTreeParser:
+    # accepts the programs ÇParser accepts. the operators of an expression
+    # are parsed by precedence, all of them left associative
+    precedence = {'+': 1, '-': 1, '*': 2, '/': 2, '%': 2}
+
+    def __init__(self, tokens):
+        self.tokens = tokens + [('$end', None, None)] * 3
+        self.index = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.index + offset][0]
+
+    def expect(self, kind):
+        token = self.tokens[self.index]
+        if token[0] != kind:
+            raise Fallback()
+        self.index += 1
+        return token
+
+    # ---------------- program ----------------
+
+    def program(self):
+        # ([function, ...], main statements)
+        try:
+            self.expect('STDIO')
+            functions = []
+            while self.peek() != 'INT' or self.peek(1) != 'MAIN':
+                functions.append(self.function())
+            for kind in ('INT', 'MAIN', '(', ')', '{'):
+                self.expect(kind)
+            main = self.statements()
+            self.expect('}')
+            self.expect('$end')
+        except RecursionError:
+            raise Fallback()
+        return functions, main
+
+    def function(self):
+        kind = self.peek()
+        if kind != 'VOID' and kind != 'INT':
+            raise Fallback()
+        self.index += 1
+        name = self.expect('NAME')[1]
+        self.expect('(')
+        # the names separated by spaces, as ÇParser makes them
+        parameters = ''
+        while self.peek() == 'INT':
+            self.index += 1
+            parameters += self.expect('NAME')[1]
+            if self.peek() != ',':
+                break
+            self.index += 1
+            parameters += ' '
+        self.expect(')')
+        self.expect('{')
+        body = self.statements()
+        self.expect('}')
+        return ('function', kind, name, parameters, body)
+
+    # ---------------- statements ----------------
+
+    def statements(self):
+        # a function or a return can only be the last statement
+        body = []
+        while True:
+            kind = self.tokens[self.index][0]
+            if kind == 'VOID' or kind == 'INT' and self.peek(1) == 'NAME' and self.peek(2) == '(':
+                body.append(self.function())
+                return body
+            if kind == 'RETURN':
+                self.index += 1
+                body.append(('return_st', self.expression()))
+                self.expect(';')
+                return body
+            if kind not in self.statement_kinds:
+                return body
+            body.append(self.statement_kinds[kind](self))
+
+    def while_st(self):
+        self.index += 1
+        self.expect('(')
+        left = self.expression()
+        comp = self.expect('COMP')[1]
+        right = self.expression()
+        self.expect(')')
+        self.expect('{')
+        body = self.statements()
+        self.expect('}')
+        return ('while_st', left, comp, right, body)
+
+    def while_break_continue(self):
+        _, word, lineno = self.expect('BREAKCONTINUE')
+        self.expect(';')
+        return ('while_break_continue', word, lineno)
+
+    def if_st(self):
+        self.index += 1
+        self.expect('(')
+        left = self.expression()
+        comp = self.expect('COMP')[1]
+        right = self.expression()
+        self.expect(')')
+        self.expect('{')
+        body = self.statements()
+        self.expect('}')
+        return ('if_st', left, comp, right, body)
+
+    def printf(self):
+        lineno = self.expect('PRINTF')[2]
+        self.expect('(')
+        _, string, string_lineno = self.expect('STRING')
+        arguments = []
+        while self.peek() == ',':
+            comma_lineno = self.tokens[self.index][2]
+            self.index += 1
+            arguments.append((self.expression(), comma_lineno))
+        self.expect(')')
+        self.expect(';')
+        return ('printf', string, string_lineno, arguments, lineno)
+
+    def declaration(self):
+        lineno = self.expect('INT')[2]
+        name = self.expect('NAME')[1]
+        if self.peek() == '=':
+            self.index += 1
+            value = self.expression()
+            self.expect(';')
+            return ('declaration', name, lineno, value)
+        self.expect('[')
+        if self.peek() != ']':
+            size = self.expression()
+            self.expect(']')
+            self.expect(';')
+            return ('array_declaration', name, lineno, size)
+        for kind in (']', '=', '{'):
+            self.expect(kind)
+        values = [self.expression()]
+        while self.peek() == ',':
+            self.index += 1
+            values.append(self.expression())
+        self.expect('}')
+        self.expect(';')
+        return ('array_literal_declaration', name, lineno, values)
+
+    def attribution(self):
+        _, name, lineno = self.expect('NAME')
+        kind = self.peek()
+        if kind == '(':
+            call = self.call(name)
+            self.expect(';')
+            return call
+        if kind == '=':
+            self.index += 1
+            value = self.expression()
+            self.expect(';')
+            return ('attribution', name, lineno, value)
+        self.expect('[')
+        index = self.expression()
+        self.expect(']')
+        self.expect('=')
+        value = self.expression()
+        self.expect(';')
+        return ('array_attribution', name, lineno, index, value)
+
+    statement_kinds = {'WHILE': while_st, 'BREAKCONTINUE': while_break_continue, 'IF': if_st,
+                       'PRINTF': printf, 'INT': declaration, 'NAME': attribution}
+
+    # ---------------- expressions ----------------
+
+    def expression(self, level=0):
+        # the operators binding tighter than level, and their operands
+        left = self.operand()
+        tokens = self.tokens
+        precedence = self.precedence
+        while True:
+            op = tokens[self.index][0]
+            binding = precedence.get(op, 0)
+            if binding <= level:
+                return left
+            self.index += 1
+            left = ('binary', op, left, self.expression(binding))
+
+    def operand(self):
+        kind, value, lineno = self.tokens[self.index]
+        self.index += 1
+        if kind == 'NUMBER':
+            return ('number', value)
+        if kind == 'NAME':
+            following = self.tokens[self.index][0]
+            if following == '[':
+                self.index += 1
+                index = self.expression()
+                self.expect(']')
+                return ('subscript', value, lineno, index)
+            if following == '(':
+                return self.call(value)
+            return ('name', value, lineno)
+        if kind == '(':
+            inner = self.expression()
+            self.expect(')')
+            return inner
+        raise Fallback()
+
+    def call(self, name):
+        # a comma may follow the last argument
+        self.expect('(')
+        arguments = []
+        while self.peek() != ')':
+            arguments.append(self.expression())
+            if self.peek() != ',':
+                break
+            self.index += 1
+        self.expect(')')
+        return ('call', name, arguments)
+
+#################### GENERATOR ####################
+
+class ÇGenerator(frontend.Printf):
+    # the actions of ÇParser, run in the order of its reductions
+
+    RED = '\033[91m'
+    YELLOW = '\033[93m'
+    END = '\033[0m'
+
+    BINARY = {'+': 'BINARY_ADD', '-': 'BINARY_SUBTRACT', '*': 'BINARY_MULTIPLY',
+              '/': 'BINARY_FLOOR_DIVIDE', '%': 'BINARY_MODULO'}
+
+    def __init__(self, optimize=False, bounds_check=False, fuel=None):
+        self.code = []
+        self.optimize = optimize
+        self.bounds_check = bounds_check
+        self.fuel = fuel
+        self.program_code = []
+
+        self.symbols_table = []
+        self.used_vars = []
+        self.type_vars = []
+
+        self.if_count = 1
+        self.while_count = 1
+        self.while_labels = []
+
+    # output methods
+    def emit(self, *args):
+        self.code.append(' '.join(map(str, args)))
+
+    def flush(self):
+        if self.optimize:
+            self.code = optimizer.optimize(self.code)
+        if self.fuel is not None:
+            self.program_code.extend(self.code)
+        elif self.code:
+            sys.stdout.write('\n'.join(self.code) + '\n')
+        self.code = []
+
+    # error handling method
+    def show_error(self, mesg, line=None):
+        if line:
+            mesg += f' in line {line}'
+
+        print(f'{self.RED}error:', mesg, self.END, file=sys.stderr)
+        sys.exit(1)
+
+    def show_warning(self, mesg, line=None):
+        if line:
+            mesg += f' in line {line}'
+
+        print(f'{self.YELLOW}warning:', mesg, self.END, file=sys.stderr)
+
+    def warn_unused(self):
+        unusued_vars = [var for var, used in zip(self.symbols_table, self.used_vars) if not used]
+        for var in unusued_vars:
+            self.show_warning(f'{var} is defined but never used')
+
+    def declare(self, name, kind, lineno):
+        if name in self.symbols_table:
+            self.show_error(f"cannot redeclare variable '{name}'", lineno)
+        self.symbols_table.append(name)
+        self.used_vars.append(False)
+        self.type_vars.append(kind)
+
+    def check_type(self, name, kind, lineno):
+        # the position of name in the symbols table
+        if name not in self.symbols_table:
+            self.show_error(f"unknown variable '{name}'", lineno)
+        position = self.symbols_table.index(name)
+        if kind == 'int' and self.type_vars[position] == 'array':
+            self.show_error(f"'{name}' is not an int", lineno)
+        if kind == 'array' and self.type_vars[position] != 'array':
+            self.show_error(f"'{name}' is not an array", lineno)
+        return position
+
+    # ---------------- program ----------------
+
+    def program(self, tree):
+        functions, main = tree
+        self.emit("# include <stdio.h>")
+        self.emit('LOAD_CONST 0')
+        self.emit('LOAD_CONST None')
+        self.emit('IMPORT_NAME runtime')
+        self.emit('IMPORT_STAR')
+        self.emit()
+        for function in functions:
+            self.function(function)
+        self.statements(main)
+        self.emit('LOAD_CONST None')
+        self.emit('RETURN_VALUE')
+        self.emit('\n# symbols table:', self.symbols_table)
+        self.emit('\n# used variables:', self.used_vars)
+        self.warn_unused()
+        self.flush()
+        if self.fuel is not None:
+            # imported here, it imports the runtime of the programs
+            import interpreter
+            for line in interpreter.precompute(self.program_code, self.fuel):
+                print(line)
+
+    def function(self, node):
+        _, kind, name, parameters, body = node
+        self.emit("# void", name, "(){}")
+        self.emit('.begin', name, parameters)
+        for param in parameters.split():
+            self.symbols_table.append(param)
+            self.used_vars.append(False)
+            self.type_vars.append('int')
+            self.emit("# param", param)
+        self.emit()
+        self.statements(body)
+        if kind == 'VOID':
+            self.emit('LOAD_CONST None')
+            self.emit('RETURN_VALUE')
+        self.emit('.end ')
+        self.emit('# symbols table:', self.symbols_table)
+        self.emit('# used variables:', self.used_vars)
+        self.warn_unused()
+        self.symbols_table = []
+        self.used_vars = []
+        self.type_vars = []
+        self.emit()
+        self.flush()
+
+    # ---------------- statements ----------------
+
+    def statements(self, body):
+        for node in body:
+            kind = node[0]
+            if kind == 'function':
+                self.function(node)
+            elif kind == 'return_st':
+                self.expression(node[1])
+                self.emit('RETURN_VALUE')
+            else:
+                getattr(self, kind)(node)
+                self.emit()
+
+    def while_st(self, node):
+        # the test is emitted before the loop and copied after the body
+        _, left, comp, right, body = node
+        start = len(self.code)
+        self.expression(left)
+        self.expression(right)
+        self.emit('COMPARE_OP', comp)
+        condition = self.code[start:]
+        label = self.while_count
+        self.emit(f'POP_JUMP_IF_FALSE NOT_WHILE_{label}')
+        self.emit(f'DO_WHILE_{label}:')
+        self.while_labels.append(label)
+        self.while_count += 1
+        self.statements(body)
+        self.while_labels.pop(-1)
+        self.emit(f'WHILE_{label}:')
+        self.code.extend(condition)
+        self.emit(f'POP_JUMP_IF_TRUE DO_WHILE_{label}')
+        self.emit(f'NOT_WHILE_{label}:')
+
+    def while_break_continue(self, node):
+        _, word, lineno = node
+        if (self.while_labels == []):
+            self.show_error(f'"{word}" outside of loop', lineno)
+        elif (word == 'break'):
+            self.emit(f'JUMP_ABSOLUTE NOT_WHILE_{self.while_labels[-1]}')
+        else:
+            self.emit(f'JUMP_ABSOLUTE WHILE_{self.while_labels[-1]}')
+
+    def if_st(self, node):
+        _, left, comp, right, body = node
+        self.expression(left)
+        self.expression(right)
+        self.emit('COMPARE_OP', comp)
+        label = self.if_count
+        self.emit(f'POP_JUMP_IF_FALSE NOT_IF_{label}')
+        self.if_count += 1
+        self.statements(body)
+        self.emit(f'NOT_IF_{label}:')
+
+    def printf(self, node):
+        _, string, string_lineno, arguments, lineno = node
+        pieces, strings = self.emit_printf_format(string, string_lineno)
+        for index, (argument, comma_lineno) in enumerate(arguments, 1):
+            self.expression(argument)
+            strings += self.emit_printf_argument(pieces, index, comma_lineno)
+        self.emit_printf_call(pieces, len(arguments), strings, lineno)
+
+    def declaration(self, node):
+        _, name, lineno, value = node
+        self.expression(value)
+        self.declare(name, 'int', lineno)
+        self.emit('STORE_FAST', name)
+
+    def array_literal_declaration(self, node):
+        _, name, lineno, values = node
+        self.emit("LOAD_GLOBAL array_of")
+        for value in values:
+            self.expression(value)
+        self.declare(name, 'array', lineno)
+        self.emit("#", name, None)
+        self.emit('BUILD_LIST', len(values))
+        self.emit('CALL_FUNCTION', 1)
+        self.emit('STORE_FAST', name)
+
+    def array_declaration(self, node):
+        _, name, lineno, size = node
+        self.emit("LOAD_GLOBAL array_zero")
+        self.expression(size)
+        self.declare(name, 'array', lineno)
+        self.emit('CALL_FUNCTION', 1)
+        self.emit('STORE_FAST', name)
+
+    def attribution(self, node):
+        _, name, lineno, value = node
+        self.expression(value)
+        self.check_type(name, 'int', lineno)
+        self.emit('STORE_FAST', name)
+
+    def array_attribution(self, node):
+        _, name, lineno, index, value = node
+        self.check_type(name, 'array', lineno)
+        self.emit('LOAD_FAST', name)
+        self.emit_check_index(name)
+        self.expression(index)
+        if self.bounds_check:
+            self.emit('CALL_FUNCTION', 2)
+        self.expression(value)
+        self.emit('ROT_THREE')
+        self.emit("STORE_SUBSCR")
+
+    def call(self, node):
+        _, name, arguments = node
+        self.emit('# name(arguments);')
+        self.emit('LOAD_GLOBAL', name)
+        for argument in arguments:
+            self.expression(argument)
+        self.emit('#', len(arguments))
+        self.emit('CALL_FUNCTION', len(arguments))
+        self.emit()
+
+    # ---------------- expressions ----------------
+
+    def expression(self, node):
+        # the most frequent instructions are appended to self.code directly
+        kind = node[0]
+        if kind == 'binary':
+            # the left operands of a chain like a - b - c without recursion
+            chain = []
+            while node[0] == 'binary':
+                chain.append(node)
+                node = node[2]
+            self.expression(node)
+            for _, op, _, right in reversed(chain):
+                self.expression(right)
+                self.code.append(self.BINARY[op])
+        elif kind == 'number':
+            self.code.append('LOAD_CONST ' + node[1])
+        elif kind == 'name':
+            _, name, lineno = node
+            self.used_vars[self.check_type(name, 'int', lineno)] = True
+            self.code.append('LOAD_FAST ' + name)
+        elif kind == 'subscript':
+            _, name, lineno, index = node
+            self.used_vars[self.check_type(name, 'array', lineno)] = True
+            self.emit('LOAD_FAST', name)
+            self.emit_check_index(name)
+            self.expression(index)
+            if self.bounds_check:
+                self.emit('CALL_FUNCTION', 2)
+            self.emit("BINARY_SUBSCR")
+        else:
+            self.call(node)
+
+    def emit_check_index(self, name):
+        if self.bounds_check:
+            self.emit('LOAD_GLOBAL check_index')
+            self.emit('LOAD_FAST', name)
+
+#################### MAIN ####################
+
+if __name__ == '__main__':
+    arguments = sys.argv[:]
+
+    optimize, bounds_check, fuel = frontend.options()
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+
+    # the tokens and the tree have no cycles and are kept until the end:
+    # the garbage collector would only go through them again and again
+    gc.disable()
+
+    try:
+        tree = ÇTreeParser(tokenize(text)).program()
+    except Fallback:
+        # compiler.py reads the input again
+        sys.argv = arguments
+        sys.stdin = io.StringIO(text)
+        runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compiler.py'),
+                       run_name='__main__')
+        sys.exit()
+
+    if len(sys.argv) > 2:
+        sys.stdout = open(sys.argv[2], 'w')
+
+    ÇGenerator(optimize, bounds_check, fuel).program(tree)
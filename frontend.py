@@ -0,0 +1,120 @@
+# what compiler.py and fastcompiler.py share: their command line options
+# and the lowering of printf. the generators using Printf have emit() and
+# show_error()
+
+import re
+import sys
+import optimizer
+
+#################### OPTIONS ####################
+
+def options():
+    # (optimize, bounds_check, fuel) from the options in sys.argv, which
+    # are removed from it. --inline sets optimizer.inline_threshold
+    optimize = False
+
+    if '-O' in sys.argv:
+        optimize = True
+        sys.argv.remove('-O')
+
+    for arg in sys.argv[1:]:
+        if arg.startswith('--inline='):
+            optimizer.inline_threshold = int(arg[len('--inline='):])
+            sys.argv.remove(arg)
+
+    bounds_check = False
+
+    if '--bounds-check' in sys.argv:
+        bounds_check = True
+        sys.argv.remove('--bounds-check')
+
+    # programs read no input: run them while compiling, for at most this many
+    # instructions, and output a program printing what they print
+    fuel = None
+
+    for arg in sys.argv[1:]:
+        if arg == '--precompute':
+            fuel = 10 ** 6
+            sys.argv.remove(arg)
+        elif arg.startswith('--precompute='):
+            fuel = int(arg[len('--precompute='):])
+            sys.argv.remove(arg)
+
+    return optimize, bounds_check, fuel
+
+#################### PRINTF ####################
+
+class Printf:
+    # the format is parsed at compile time: each conversion becomes a
+    # FORMAT_VALUE of its argument and the pieces are joined by BUILD_STRING
+    # and written by runtime.printf. a printf is emitted by emit_printf_format,
+    # then emit_printf_argument after each argument and emit_printf_call
+
+    format_re = re.compile(r'([^%]+)|%([-+ #0]*)(\d*)(.?)')
+
+    def emit_printf_format(self, string, line):
+        # the pieces of the format and the number of strings pushed
+        self.emit("# printf(", string, ")")
+        self.emit('LOAD_GLOBAL', 'printf')
+        pieces = self.parse_format(string[1:-1], line)
+        return pieces, self.emit_printf_literal(pieces[0][1])
+
+    def emit_printf_argument(self, pieces, index, line):
+        # converts argument index (from 1), the number of strings pushed
+        if (index >= len(pieces)):
+            self.show_error(f'printf expects {len(pieces) - 1} arguments, more given', line)
+        spec, literal, unsigned = pieces[index]
+        if unsigned:
+            # a 32-bit int converted to unsigned, as in C
+            self.emit('LOAD_CONST', 1 << 32)
+            self.emit('BINARY_MODULO')
+        if spec:
+            self.emit('LOAD_CONST', f"'{spec}'")
+            self.emit('FORMAT_VALUE', 4)
+        else:
+            self.emit('FORMAT_VALUE', 0)
+        return 1 + self.emit_printf_literal(literal)
+
+    def emit_printf_call(self, pieces, arguments, strings, line):
+        expected = len(pieces) - 1
+        if (arguments < expected):
+            self.show_error(f'printf expects {expected} arguments, {arguments} given', line)
+        if (strings == 0):
+            self.emit('LOAD_CONST', "''")
+        elif (strings > 1):
+            self.emit('BUILD_STRING', strings)
+        self.emit('CALL_FUNCTION', 1)
+        self.emit('POP_TOP')
+
+    def emit_printf_literal(self, literal):
+        # the number of strings pushed
+        if literal:
+            self.emit('LOAD_CONST', f"'{literal}'")
+            return 1
+        return 0
+
+    def parse_format(self, fmt, line):
+        # [(None, text, False), (spec, text, unsigned), ...]: the text
+        # before the first conversion, then the Python format spec of each
+        # conversion, the text after it and whether C reads the argument as
+        # an unsigned int (%u %x %X %o)
+        pieces = [[None, '', False]]
+        for text, flags, width, conversion in self.format_re.findall(fmt):
+            if text:
+                pieces[-1][1] += text
+            elif conversion == '%':
+                pieces[-1][1] += '%'
+            elif conversion == '' or conversion not in 'diuxXocs':
+                self.show_error(f"unknown printf conversion '%{flags}{width}{conversion}'", line)
+            elif '#' in flags:
+                # Python writes 0o17 and 0x0 where C writes 017 and 0
+                self.show_error(f"unsupported printf flag '#' in '%{flags}{width}{conversion}'", line)
+            else:
+                # C ignores + and space but for signed conversions
+                spec = '<' if '-' in flags else ''
+                if conversion in 'di':
+                    spec += '+' if '+' in flags else ' ' if ' ' in flags else ''
+                spec += '0' if '0' in flags and '-' not in flags else ''
+                spec += width + (conversion if conversion in 'xXoc' else '')
+                pieces.append([spec, '', conversion in 'uxXo'])
+        return pieces
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+# incremental analysis of a Ç program for editors. the text is kept in
+# top-level units: the #include, each function and main, each with its
+# tokens, its tree (as fastcompiler.py builds it) and its diagnostics.
+# the lines of a unit count from its first line, so a unit is the same
+# wherever it is in the file. an edit re-lexes and re-parses only the
+# units it touches, and more only when it moves a boundary between units
+# (an unclosed brace or string)
+
+# USAGE:
+# python3 incremental.py [input_file]
+# prints the diagnostics of the program
+
+import sys
+from array import array
+from fastcompiler import KEYWORDS, KIND_RE, SCAN_RE, Fallback, ÇGenerator, ÇTreeParser
+
+#################### LEXER ####################
+
+def lex(text):
+    # (tokens, offsets, lines, errors) for a piece of text, lexed as
+    # ÇLexer does from line 1: the tokens as fastcompiler.tokenize makes
+    # them, their offsets in text, the number of lines the lexer counts in
+    # it and the illegal characters as (offset, character, lineno)
+    tokens = []
+    offsets = array('i')
+    errors = []
+    lineno = 1
+    kinds = {}
+    for m in SCAN_RE.finditer(text):
+        value = m.group()
+        kind = kinds.get(value)
+        if kind is None:
+            kind = KIND_RE.match(value).lastgroup
+            if kind == 'literal':
+                kind = value
+            elif kind == 'NAME':
+                kind = KEYWORDS.get(value, kind)
+            kinds[value] = kind
+        if kind == 'ignore' or kind == 'comment':
+            continue
+        if kind == 'newline':
+            lineno += len(value)
+        elif kind == 'error':
+            errors.append((m.start(), value, lineno))
+        else:
+            tokens.append((kind, value, lineno))
+            offsets.append(m.start())
+    return tokens, offsets, lineno - 1, errors
+
+#################### UNITS ####################
+
+class Diagnoser(ÇGenerator):
+    # the checks of ÇGenerator, with the messages kept instead of printed.
+    # an error ends the unit, as it ends the compilation
+
+    class Stop(Exception):
+        pass
+
+    def __init__(self):
+        super().__init__()
+        self.diagnostics = []
+
+    def flush(self):
+        self.code = []
+
+    def show_error(self, mesg, line=None):
+        self.diagnostics.append(('error', mesg, line or 1))
+        raise self.Stop()
+
+    def show_warning(self, mesg, line=None):
+        self.diagnostics.append(('warning', mesg, line or 1))
+
+
+class Unit:
+    # a top-level part of the program. kind is 'include', 'function',
+    # 'main' or None when the unit can't be parsed. unclosed tells if a "
+    # in it starts no string: the string could end in any unit after it
+
+    __slots__ = ('text', 'lines', 'tokens', 'offsets', 'unclosed', 'kind', 'tree', 'diagnostics')
+
+    def __init__(self, text, tokens, offsets, lines, errors):
+        self.text = text
+        self.lines = lines
+        self.tokens = tokens
+        self.offsets = offsets
+        self.unclosed = any(character == '"' for _, character, _ in errors)
+        self.diagnostics = [('error', f"Illegal character '{character}'", lineno)
+                            for _, character, lineno in errors]
+        self.kind, self.tree = self.parse()
+        if self.kind is not None:
+            self.diagnose()
+
+    def parse(self):
+        # (kind, tree), a syntax error going into the diagnostics
+        parser = ÇTreeParser(self.tokens)
+        try:
+            if parser.peek() == 'STDIO':
+                parser.index += 1
+                parser.expect('$end')
+                return 'include', None
+            if parser.peek() == 'INT' and parser.peek(1) == 'MAIN':
+                for kind in ('INT', 'MAIN', '(', ')', '{'):
+                    parser.expect(kind)
+                main = parser.statements()
+                parser.expect('}')
+                parser.expect('$end')
+                return 'main', main
+            function = parser.function()
+            parser.expect('$end')
+            return 'function', function
+        except (Fallback, RecursionError):
+            _, value, lineno = parser.tokens[parser.index]
+            if value is None:
+                mesg = 'syntax error at the end'
+                lineno = self.tokens[-1][2] if self.tokens else 1
+            else:
+                mesg = f"syntax error at '{value}'"
+            self.diagnostics.append(('error', mesg, lineno))
+            return None, None
+
+    def diagnose(self):
+        generator = Diagnoser()
+        try:
+            if self.kind == 'function':
+                generator.function(self.tree)
+            elif self.kind == 'main':
+                generator.statements(self.tree)
+                generator.warn_unused()
+        except Diagnoser.Stop:
+            pass
+        self.diagnostics += generator.diagnostics
+
+
+def split(text):
+    # the units of text. a unit ends after the #include or the } closing a
+    # function, or at the end of text; the text after its last token is in it
+    tokens, offsets, _, _ = lex(text)
+    ends = []                           # index of the last token of each unit
+    depth = 0
+    for index, (kind, value, lineno) in enumerate(tokens):
+        if kind == '{':
+            depth += 1
+        elif kind == '}':
+            depth -= 1
+            if depth == 0:
+                ends.append(index)
+        elif kind == 'STDIO' and depth == 0:
+            ends.append(index)
+    if not ends or ends[-1] != len(tokens) - 1:
+        ends.append(len(tokens) - 1)
+
+    units = []
+    begin = 0
+    for last in ends:
+        following = offsets[last + 1] if last + 1 < len(tokens) else len(text)
+        piece = text[begin:following]
+        units.append(Unit(piece, *lex(piece)))
+        begin = following
+    return units
+
+#################### DOCUMENT ####################
+
+class Document:
+    # a program being edited
+
+    def __init__(self, text=''):
+        self.units = split(text) if text else []
+
+    @property
+    def text(self):
+        return ''.join(unit.text for unit in self.units)
+
+    def edit(self, start, end, text):
+        # replaces the characters from start to end by text. returns the
+        # first unit analysed again and the number of units now in place
+        # of the units the edit touched
+        first = None
+        last = position = 0
+        for number, unit in enumerate(self.units):
+            if position > end:
+                break
+            following = position + len(unit.text)
+            if first is None and following >= start:
+                first, begin = number, position
+            last = number + 1
+            position = following
+        if first is None:
+            first, begin = last, position
+        for number, unit in enumerate(self.units[:first]):
+            if unit.unclosed:
+                # the only one: no " follows it
+                begin -= sum(len(before.text) for before in self.units[number:first])
+                first = number
+                break
+        old = ''.join(unit.text for unit in self.units[first:last])
+        region = old[:start - begin] + text + old[end - begin:]
+
+        # the units of region stand if it still starts with a token, the
+        # previous unit ending before it, and the next unit still starts
+        # where it did: after a unit ended, with its first token. else region
+        # grows by the unit before or after it
+        while True:
+            head = ''
+            if last < len(self.units):
+                following = self.units[last]
+                head = following.text[:following.offsets[0] + len(following.tokens[0][1])]
+            units = split(region + head) if region + head else []
+            if first > 0 and not (units and units[0].tokens and units[0].offsets[0] == 0):
+                first -= 1
+                region = self.units[first].text + region
+            elif head and not (len(units) > 1 and units[-1].text == head
+                               and not any(unit.unclosed for unit in units)):
+                region += following.text
+                last += 1
+            else:
+                break
+        if head:
+            units.pop()
+
+        self.units[first:last] = units
+        return first, len(units)
+
+    def tokens(self):
+        # (kind, value, lineno) of the whole program
+        base = 0
+        for unit in self.units:
+            for kind, value, lineno in unit.tokens:
+                yield kind, value, base + lineno
+            base += unit.lines
+
+    def diagnostics(self):
+        # [(level, message, lineno)] of the whole program: those of the
+        # units, and the units out of place
+        result = []
+        base = 0
+        for number, unit in enumerate(self.units):
+            for level, mesg, lineno in unit.diagnostics:
+                result.append((level, mesg, base + lineno))
+            if number == 0:
+                expected = 'include'
+            elif number == len(self.units) - 1:
+                expected = 'main'
+            else:
+                expected = 'function'
+            if unit.kind is not None and unit.kind != expected:
+                result.append(('error', f'{expected} expected', base + 1))
+            base += unit.lines
+        if len(self.units) < 2:
+            result.append(('error', 'main expected', base + 1))
+        return result
+
+#################### MAIN ####################
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+
+    for level, mesg, lineno in Document(text).diagnostics():
+        print(f'{level}: {mesg} in line {lineno}')
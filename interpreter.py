@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# runs a pyasm program without assembling it, with a limit on the number
+# of instructions (fuel). used by compiler.py --precompute to find the
+# output of a program at compile time; run directly it prints the output,
+# which must match assembler.py --run for the same file
+
+# USAGE:
+# python3 interpreter.py [--fuel=max_instructions] [input_file]
+
+import operator
+import sys
+import runtime
+
+BINARY = {'BINARY_ADD': operator.add, 'BINARY_SUBTRACT': operator.sub,
+          'BINARY_MULTIPLY': operator.mul, 'BINARY_FLOOR_DIVIDE': operator.floordiv,
+          'BINARY_MODULO': operator.mod, 'BINARY_SUBSCR': operator.getitem}
+
+COMPARE = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+           '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+class OutOfFuel(Exception):
+    pass
+
+
+class Function:
+    # a function between .begin and .end
+    def __init__(self, name, parameters):
+        self.name = name
+        self.parameters = parameters
+        self.code = []
+        self.labels = {}
+
+
+def parse(lines):
+    # the module code as a Function, the functions defined in it are
+    # ('.define', Function) instructions
+    module = Function('<module>', [])
+    function = module
+    for line in lines:
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+        # operands as assembler.py reads them
+        op = line.split(maxsplit=1) if '"' in line or "'" in line else line.split()
+        if len(op) == 1 and op[0].endswith(':'):
+            function.labels[op[0][:-1]] = len(function.code)
+        elif op[0] == '.begin':
+            function = Function(op[1], op[2:])
+        elif op[0] == '.end':
+            module.code.append(('.define', function))
+            function = module
+        elif len(op) == 1:
+            function.code.append((op[0], None))
+        elif op[1].isdigit():
+            function.code.append((op[0], int(op[1])))
+        else:
+            function.code.append((op[0], string(op[1])))
+    return module
+
+
+def string(operand):
+    # an operand as assembler.py cleans it up
+    if operand.startswith("'"):
+        return operand[1:-1].replace('\\n', '\n').replace('\\t', '\t')
+    return operand.replace('"', '').replace('\\n', '\n').rstrip()
+
+
+def run(lines, fuel=None, output=None):
+    # the output of the program, also appended to output piece by piece;
+    # raises OutOfFuel when it executes more than fuel instructions and
+    # whatever the program raises
+    if output is None:
+        output = []
+    names = {}
+    fuel = [fuel]
+
+    def call(function, arguments):
+        if len(arguments) != len(function.parameters):
+            raise TypeError(f'{function.name}() takes {len(function.parameters)} arguments')
+        local = dict(zip(function.parameters, arguments))
+        stack = []
+        pc = 0
+        while True:
+            if fuel[0] is not None:
+                fuel[0] -= 1
+                if fuel[0] < 0:
+                    raise OutOfFuel()
+            op, arg = function.code[pc]
+            pc += 1
+            if op == 'LOAD_FAST':
+                if arg not in local:
+                    raise UnboundLocalError(f"local variable '{arg}' referenced before assignment")
+                stack.append(local[arg])
+            elif op == 'STORE_FAST':
+                local[arg] = stack.pop()
+            elif op == 'LOAD_CONST':
+                stack.append(arg)
+            elif op in BINARY:
+                right = stack.pop()
+                stack[-1] = BINARY[op](stack[-1], right)
+            elif op == 'COMPARE_OP':
+                right = stack.pop()
+                stack[-1] = COMPARE[arg](stack[-1], right)
+            elif op == 'POP_JUMP_IF_FALSE':
+                if not stack.pop():
+                    pc = function.labels[arg]
+            elif op == 'POP_JUMP_IF_TRUE':
+                if stack.pop():
+                    pc = function.labels[arg]
+            elif op == 'JUMP_ABSOLUTE':
+                pc = function.labels[arg]
+            elif op == 'LOAD_GLOBAL':
+                if arg not in names:
+                    raise NameError(f"name '{arg}' is not defined")
+                stack.append(names[arg])
+            elif op == 'CALL_FUNCTION':
+                arguments = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                f = stack.pop()
+                stack.append(call(f, arguments) if isinstance(f, Function) else f(*arguments))
+            elif op == 'RETURN_VALUE':
+                return stack.pop()
+            elif op == 'POP_TOP':
+                stack.pop()
+            elif op == 'DUP_TOP':
+                stack.append(stack[-1])
+            elif op == 'ROT_TWO':
+                stack[-2:] = [stack[-1], stack[-2]]
+            elif op == 'ROT_THREE':
+                stack[-3:] = [stack[-1], stack[-3], stack[-2]]
+            elif op == 'STORE_SUBSCR':
+                index = stack.pop()
+                array = stack.pop()
+                array[index] = stack.pop()
+            elif op == 'BUILD_LIST':
+                values = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                stack.append(values)
+            elif op == 'BUILD_SLICE':
+                stop = stack.pop()
+                stack[-1] = slice(stack[-1], stop)
+            elif op == 'FORMAT_VALUE':
+                spec = stack.pop() if arg & 0x04 else ''
+                stack[-1] = format(stack[-1], spec)
+            elif op == 'BUILD_STRING':
+                pieces = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                stack.append(''.join(pieces))
+            elif op == 'IMPORT_NAME':
+                stack[-2:] = [runtime]
+            elif op == 'IMPORT_STAR':
+                module = stack.pop()
+                names.update((k, v) for k, v in vars(module).items() if not k.startswith('_'))
+                # output is collected instead of written
+                names['printf'] = output.append
+            elif op == '.define':
+                names[arg.name] = arg
+            else:
+                raise NotImplementedError(f'{op} is not supported by the interpreter')
+
+    call(parse(lines), [])
+    return ''.join(output)
+
+
+def precompute(lines, fuel):
+    # a program printing the output of lines when it can be found within
+    # fuel instructions (and written as a pyasm string), otherwise lines
+    try:
+        output = run(lines, fuel)
+    except Exception:
+        # out of fuel, or an error that must happen when the program runs
+        return lines
+    if '\\' in output \
+            or not all(c.isprintable() or c in '\n\t' for c in output):
+        return lines
+    text = output.replace('\n', '\\n').replace('\t', '\\t')
+    result = ['# include <stdio.h>', 'LOAD_CONST 0', 'LOAD_CONST None',
+              'IMPORT_NAME runtime', 'IMPORT_STAR', '',
+              f'# output computed by the compiler ({len(output)} characters)']
+    if output:
+        result += ['LOAD_GLOBAL printf', f"LOAD_CONST '{text}'", 'CALL_FUNCTION 1', 'POP_TOP']
+    return result + ['LOAD_CONST None', 'RETURN_VALUE']
+
+
+if __name__ == '__main__':
+    fuel = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--fuel='):
+            fuel = int(arg[len('--fuel='):])
+            sys.argv.remove(arg)
+
+    if len(sys.argv) > 1:
+        sys.stdin = open(sys.argv[1], 'r', encoding='utf-8')
+
+    output = []
+    try:
+        run(sys.stdin.read().split('\n'), fuel, output)
+    finally:
+        sys.stdout.write(''.join(output))
@@ -0,0 +1,1059 @@
+# optimization passes over the pyasm emitted by compiler.py (enabled by -O)
+#
+# the passes work on the lines of one function (or of main), the same text
+# that is written to the .pyasm file: instructions, labels, comments and
+# blank lines
+
+# binary operators without side effects
+PURE_OPS = {'BINARY_ADD', 'BINARY_SUBTRACT', 'BINARY_MULTIPLY',
+            'BINARY_FLOOR_DIVIDE', 'BINARY_MODULO'}
+
+# operators that raise on a zero right operand
+DIV_OPS = {'BINARY_FLOOR_DIVIDE', 'BINARY_MODULO'}
+
+JUMP_OPS = {'JUMP_ABSOLUTE', 'POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE'}
+
+# counter for hidden local variables (names in Ç never contain '_')
+temp_count = 0
+
+
+def new_temp(prefix):
+    global temp_count
+    temp_count += 1
+    return f'_{prefix}{temp_count}'
+
+
+# functions small enough to be inlined: name -> (parameters, body)
+functions = {}
+
+# largest function body, in instructions, that is inlined (0 disables)
+inline_threshold = 24
+
+
+def optimize(code):
+    code = eliminate_tail_calls(code)
+    code = inline_calls(code)
+    code = eliminate_bounds_checks(code)
+    code = evaluate_loops(code)
+    code = replace_idioms(code)
+    code = vectorize_loops(code)
+    code = hoist_invariants(code)
+    code = reuse_subexpressions(code)
+    save_function(code)
+    return code
+
+
+# ---------------- helpers ----------------
+
+def split(line):
+    # returns (opcode, argument) or None for comments and blank lines
+    line = line.strip()
+    if line == '' or line.startswith('#'):
+        return None
+    op = line.split(maxsplit=1)
+    return op[0], op[1] if len(op) > 1 else None
+
+
+def is_label(line):
+    op = split(line)
+    return op is not None and op[0].endswith(':')
+
+
+def find(code, line, start=0):
+    # index of the instruction equal to line, or -1
+    for i in range(start, len(code)):
+        if code[i].strip() == line:
+            return i
+    return -1
+
+
+def stack_effect(op, arg):
+    # returns (number of values popped, number of values pushed)
+    if op in ('LOAD_CONST', 'LOAD_FAST', 'LOAD_NAME', 'LOAD_GLOBAL', 'DUP_TOP'):
+        return 0, 1
+    if op in PURE_OPS or op in ('BINARY_SUBSCR', 'COMPARE_OP'):
+        return 2, 1
+    if op in ('STORE_FAST', 'POP_TOP', 'RETURN_VALUE',
+              'POP_JUMP_IF_FALSE', 'POP_JUMP_IF_TRUE'):
+        return 1, 0
+    if op == 'STORE_SUBSCR':
+        return 3, 0
+    if op in ('ROT_TWO', 'ROT_THREE'):
+        return 0, 0
+    if op == 'CALL_FUNCTION':
+        return int(arg) + 1, 1
+    if op in ('BUILD_LIST', 'BUILD_STRING', 'BUILD_SLICE'):
+        return int(arg), 1
+    if op == 'FORMAT_VALUE':
+        return (2 if int(arg) & 0x04 else 1), 1
+    if op == 'IMPORT_NAME':
+        return 2, 1
+    if op == 'IMPORT_STAR':
+        return 1, 0
+    return 0, 0
+
+
+def simulate(stack, op, arg, value):
+    # applies op to a simulated stack, value is what it pushes; values
+    # below the start of the simulation are None
+    if op in ('ROT_TWO', 'ROT_THREE'):
+        n = 2 if op == 'ROT_TWO' else 3
+        stack[:0] = [None] * (n - len(stack))
+        stack[-n:] = [stack[-1]] + stack[-n:-1]
+        return
+    pops, pushes = stack_effect(op, arg)
+    del stack[max(len(stack) - pops, 0):]
+    if pushes:
+        stack.append(value)
+        stack.extend([None] * (pushes - 1))
+
+
+def values(code, start, end, leaves=False):
+    # simulates the stack over code[start:end] and describes every value
+    # built only from literals, local variables and pure operators (single
+    # literals and variables only when leaves is set):
+    #   start, end  first and last line of the expression
+    #   ops         number of operators in it
+    #   names       local variables read (arrays included)
+    #   arrays      arrays subscripted
+    #   safe        evaluating it can never raise
+    result = []
+    stack = []
+    for i in range(start, end):
+        op = split(code[i])
+        if op is None:
+            continue
+        if is_label(code[i]) or op[0].startswith('.'):
+            # values never flow across a label
+            stack = [None] * len(stack)
+            continue
+        op, arg = op
+        value = None
+        if op == 'LOAD_CONST' and arg.lstrip('-').isdigit():
+            value = {'start': i, 'end': i, 'ops': 0, 'names': set(),
+                     'arrays': set(), 'safe': True, 'const': int(arg)}
+            if leaves:
+                result.append(value)
+        elif op == 'LOAD_FAST':
+            value = {'start': i, 'end': i, 'ops': 0, 'names': {arg},
+                     'arrays': set(), 'safe': True, 'const': None}
+            if leaves:
+                result.append(value)
+        elif (op in PURE_OPS or op == 'BINARY_SUBSCR') and len(stack) >= 2 \
+                and stack[-2] is not None and stack[-1] is not None:
+            left, right = stack[-2], stack[-1]
+            value = {'start': left['start'], 'end': i,
+                     'ops': left['ops'] + right['ops'] + 1,
+                     'names': left['names'] | right['names'],
+                     'arrays': left['arrays'] | right['arrays'],
+                     'safe': left['safe'] and right['safe'], 'const': None}
+            if op == 'BINARY_SUBSCR':
+                value['arrays'] = value['arrays'] | left['names']
+                value['safe'] = False
+            elif op in DIV_OPS and not right['const']:
+                value['safe'] = False
+            result.append(value)
+
+        simulate(stack, op, arg, value)
+    return result
+
+
+def stores(code, start, end):
+    # local variables and arrays written in code[start:end]
+    names = set()
+    arrays = set()
+    stack = []
+    for i in range(start, end):
+        op = split(code[i])
+        if op is None or is_label(code[i]):
+            continue
+        op, arg = op
+        if op == 'STORE_FAST':
+            names.add(arg)
+        elif op == 'STORE_SUBSCR':
+            # LOAD_FAST array, index, value, ROT_THREE, STORE_SUBSCR
+            arrays.add(stack[-2] if len(stack) >= 2 else None)
+        simulate(stack, op, arg, arg if op == 'LOAD_FAST' else None)
+    return names, arrays
+
+
+def loops(code):
+    # (name, first line, last line) of each rotated while loop, outer
+    # loops first: DO_WHILE_n: ... POP_JUMP_IF_TRUE DO_WHILE_n
+    result = []
+    for i, line in enumerate(code):
+        op = split(line)
+        if op is not None and op[0] == 'POP_JUMP_IF_TRUE' \
+                and op[1].startswith('DO_WHILE_'):
+            result.append((op[1], find(code, op[1] + ':'), i))
+    return sorted(result, key=lambda loop: loop[1])
+
+
+# ---------------- loop-invariant code motion ----------------
+
+# pure expressions inside a loop that read no variable written by the loop
+# are computed once into a hidden variable just before DO_WHILE_n, which is
+# only reached when the loop runs at least once
+
+def hoist_invariants(code):
+    for name, _, _ in loops(code):
+        code = hoist_loop(code, name)
+    return code
+
+
+def hoist_loop(code, name):
+    begin = find(code, name + ':')
+    end = find(code, 'POP_JUMP_IF_TRUE ' + name, begin)
+    names, arrays = stores(code, begin, end + 1)
+    if None in arrays:
+        arrays = None  # array not known, every subscript may change
+
+    # code before the first label or jump runs on every iteration; an
+    # expression that can raise is only hoisted from the part of it before
+    # any call (printf output) or array store, which must happen first
+    always = end
+    for i in range(begin + 1, end):
+        op = split(code[i])
+        if op is not None and (is_label(code[i]) or op[0] in JUMP_OPS
+                               or op[0] in ('CALL_FUNCTION', 'STORE_SUBSCR')):
+            always = i
+            break
+
+    # variables stored on every path to the loop are defined when it
+    # starts: a store is on every path when no jump from before it goes to
+    # a label between it and the loop (the join of an if, for instance)
+    sources = {}
+    for i, line in enumerate(code):
+        op = split(line)
+        if op is not None and op[0] in JUMP_OPS:
+            sources.setdefault(op[1] + ':', i)
+    defined = set()
+    entered = begin  # first line jumping into the code from here to the loop
+    for i in range(begin, -1, -1):
+        op = split(code[i])
+        if op is None:
+            continue
+        if is_label(code[i]):
+            entered = min(entered, sources.get(op[0], entered))
+        elif op[0] == 'STORE_FAST' and entered > i:
+            defined.add(op[1])
+        elif op[0] == '.begin':
+            defined.update(op[1].split()[1:])
+
+    invariant = []
+    for value in values(code, begin + 1, end):
+        if value['names'] & names or not value['names'] <= defined:
+            continue
+        if value['arrays'] and (arrays is None or value['arrays'] & arrays):
+            continue
+        if not value['safe'] and value['end'] >= always:
+            continue
+        invariant.append(value)
+
+    # keep the outermost invariant expressions only
+    outer = [v for v in invariant
+             if not any(w is not v and w['start'] <= v['start'] and v['end'] <= w['end']
+                        for w in invariant)]
+    if not outer:
+        return code
+
+    hoisted = []
+    temps = {}
+    new_code = code[:begin]
+    last = begin
+    for value in sorted(outer, key=lambda v: v['start']):
+        expression = tuple(line.strip() for line in code[value['start']:value['end'] + 1]
+                           if split(line) is not None)
+        if expression not in temps:
+            temps[expression] = new_temp('inv')
+            hoisted.extend(expression)
+            hoisted.append(f'STORE_FAST {temps[expression]}')
+        new_code.extend(code[last:value['start']])
+        new_code.append(f'LOAD_FAST {temps[expression]}')
+        last = value['end'] + 1
+    new_code.extend(code[last:])
+    new_code[begin:begin] = [f'# loop invariants of {name}'] + hoisted
+    return new_code
+
+
+# ---------------- common subexpressions ----------------
+
+# a pure expression computed again in the same basic block, with no store
+# to the variables or arrays it reads in between, is kept in a hidden
+# variable the first time (DUP_TOP, STORE_FAST) and loaded from it after
+
+def reuse_subexpressions(code):
+    while True:
+        group = repeated_expression(code)
+        if group is None:
+            return code
+        code = reuse_expression(code, group)
+
+
+def blocks(code):
+    # basic block number of each line
+    result = []
+    block = 0
+    for line in code:
+        op = split(line)
+        if op is not None and (is_label(line) or op[0].startswith('.')):
+            block += 1
+        result.append(block)
+        if op is not None and (op[0] in JUMP_OPS or op[0] == 'RETURN_VALUE'):
+            block += 1
+    return result
+
+
+def expression_text(code, value):
+    return tuple(line.strip() for line in code[value['start']:value['end'] + 1]
+                 if split(line) is not None)
+
+
+def repeated_expression(code):
+    # occurrences of the largest expression worth reusing, or None
+    block = blocks(code)
+    groups = {}
+    for value in values(code, 0, len(code)):
+        key = (block[value['start']], expression_text(code, value))
+        groups.setdefault(key, []).append(value)
+
+    for (_, text), occurrences in sorted(groups.items(), key=lambda g: -len(g[0][1])):
+        chain = [occurrences[0]]
+        for value in occurrences[1:]:
+            names, arrays = stores(code, chain[-1]['end'] + 1, value['start'])
+            if names & chain[0]['names'] or (chain[0]['arrays'] and arrays):
+                if len(chain) > 1:
+                    break
+                chain = [value]
+            else:
+                chain.append(value)
+        # each reuse saves len(text) - 1 instructions, DUP_TOP and STORE_FAST cost 2
+        if len(chain) > 1 and (len(chain) - 1) * (len(text) - 1) >= 2:
+            return chain
+    return None
+
+
+def reuse_expression(code, chain):
+    temp = new_temp('cse')
+    saved = (len(chain) - 1) * (len(expression_text(code, chain[0])) - 1) - 2
+    first = chain[0]['end']
+    new_code = code[:first + 1]
+    new_code.append(f'# common subexpression {temp}: {len(chain)} occurrences, '
+                    f'{saved} instructions saved')
+    new_code.append('DUP_TOP')
+    new_code.append(f'STORE_FAST {temp}')
+    last = first + 1
+    for value in chain[1:]:
+        new_code.extend(code[last:value['start']])
+        new_code.append(f'LOAD_FAST {temp}')
+        last = value['end'] + 1
+    new_code.extend(code[last:])
+    return new_code
+
+
+
+# ---------------- tail calls ----------------
+
+# a function that returns a call to itself stores the new arguments in its
+# parameters and jumps back to TAIL_name instead. returns of the form
+# f(...) * e or f(...) + e (and e * f(...), e + f(...)), where e is a pure
+# expression, keep the pending operation in an accumulator that every
+# other return applies to its value
+
+IDENTITY = {'BINARY_ADD': 0, 'BINARY_MULTIPLY': 1}
+
+
+def eliminate_tail_calls(code):
+    begin = next((i for i, line in enumerate(code) if line.startswith('.begin')), -1)
+    if begin == -1:
+        return code
+    end = next(i for i in range(begin, len(code)) if code[i].startswith('.end'))
+    name, *params = split(code[begin])[1].split()
+
+    sites = tail_calls(code, begin, end, name)
+    operators = {site['op'] for site in sites if site['op']}
+    returns_none = any(split(code[i]) == ('LOAD_CONST', 'None')
+                       and split(code[i + 1]) == ('RETURN_VALUE', None)
+                       for i in range(begin, end))
+    if len(operators) > 1 or returns_none:
+        sites = [site for site in sites if not site['op']]
+        operators = set()
+    if not sites:
+        return code
+    operator = operators.pop() if operators else None
+    acc = new_temp('acc')
+
+    new_code = code[:begin + 1]
+    if operator:
+        new_code.append(f'LOAD_CONST {IDENTITY[operator]}')
+        new_code.append(f'STORE_FAST {acc}')
+    new_code.append(f'TAIL_{name}:')
+    i = begin + 1
+    while i < end:
+        site = next((site for site in sites if site['start'] == i), None)
+        if site:
+            new_code.append(f'# tail call to {name}')
+            if site['op']:
+                new_code.append(f'LOAD_FAST {acc}')
+                new_code.extend(code[site['value']['start']:site['value']['end'] + 1])
+                new_code.append(site['op'])
+                new_code.append(f'STORE_FAST {acc}')
+            new_code.extend(code[site['load'] + 1:site['call']])
+            for param in reversed(params):
+                new_code.append(f'STORE_FAST {param}')
+            new_code.append(f'JUMP_ABSOLUTE TAIL_{name}')
+            i = site['end'] + 1
+            continue
+        if operator and split(code[i]) == ('RETURN_VALUE', None):
+            new_code.append(f'LOAD_FAST {acc}')
+            new_code.append(operator)
+        new_code.append(code[i])
+        i += 1
+    new_code.extend(code[end:])
+    return new_code
+
+
+def depths(code, start, end):
+    # stack depth before each line of code[start:end], labels start at 0
+    result = {}
+    depth = 0
+    for i in range(start, end):
+        op = split(code[i])
+        if op is not None and is_label(code[i]):
+            depth = 0
+        result[i] = depth
+        if op is not None and not is_label(code[i]):
+            pops, pushes = stack_effect(*op)
+            depth += pushes - pops
+    return result
+
+
+def next_instructions(code, start, end, count):
+    # indexes of the first count instructions in code[start:end]
+    result = []
+    for i in range(start, end):
+        if len(result) == count:
+            break
+        if split(code[i]) is not None:
+            result.append(i)
+    return result
+
+
+def call_end(code, start, end):
+    # index of the CALL_FUNCTION that calls the function loaded at start
+    depth = 0
+    for i in range(start + 1, end):
+        op = split(code[i])
+        if op is None:
+            continue
+        if is_label(code[i]):
+            return -1
+        if op[0] == 'CALL_FUNCTION' and int(op[1]) == depth:
+            return i
+        pops, pushes = stack_effect(*op)
+        depth += pushes - pops
+    return -1
+
+
+def tail_calls(code, begin, end, name):
+    # each return of a call to name with as many arguments as it has
+    # parameters, as a dict with the lines of the statement (start, end),
+    # of the call (load, call) and, for returns that also apply an
+    # operator, the operator and its pure operand
+    params = split(code[begin])[1].split()[1:]
+    depth = depths(code, begin + 1, end)
+    pure = [value for value in values(code, begin + 1, end, leaves=True) if value['safe']]
+    result = []
+    for i in range(begin + 1, end):
+        if split(code[i]) not in (('LOAD_NAME', name), ('LOAD_GLOBAL', name)):
+            continue
+        call = call_end(code, i, end)
+        if call == -1 or int(split(code[call])[1]) != len(params):
+            continue
+        after = next_instructions(code, call + 1, end, 1)
+        if not after:
+            continue
+        if depth[i] == 0 and split(code[after[0]])[0] == 'RETURN_VALUE':
+            result.append({'start': i, 'end': after[0], 'load': i, 'call': call,
+                           'op': None, 'value': None})
+            continue
+        for value in pure:
+            if depth[i] == 0 and value['start'] == after[0]:
+                # f(...) op e
+                last = next_instructions(code, value['end'] + 1, end, 2)
+            elif depth[value['start']] == 0 and next_instructions(code, value['end'] + 1, end, 1) == [i]:
+                # e op f(...)
+                last = next_instructions(code, call + 1, end, 2)
+            else:
+                continue
+            if len(last) == 2 and split(code[last[0]])[0] in IDENTITY \
+                    and split(code[last[1]])[0] == 'RETURN_VALUE':
+                result.append({'start': min(i, value['start']), 'end': last[1],
+                               'load': i, 'call': call,
+                               'op': split(code[last[0]])[0], 'value': value})
+                break
+    return result
+
+
+# ---------------- inlining ----------------
+
+# calls to small leaf functions compiled earlier are replaced by a copy of
+# their body: the arguments are stored in the renamed parameters, every
+# local and label gets a suffix unique to the copy and each return jumps to
+# END_INLINE_n with the returned value on the stack
+
+def save_function(code):
+    begin = next((i for i, line in enumerate(code) if line.startswith('.begin')), -1)
+    if begin == -1:
+        return
+    end = next(i for i in range(begin, len(code)) if code[i].startswith('.end'))
+    name, *params = split(code[begin])[1].split()
+    body = [code[i].strip() for i in range(begin + 1, end) if split(code[i]) is not None]
+    if len(body) > inline_threshold:
+        return
+    if any(split(line)[0] in ('CALL_FUNCTION', 'LOAD_NAME', 'LOAD_GLOBAL') for line in body):
+        return  # not a leaf
+    functions[name] = (params, body)
+
+
+def inline_calls(code):
+    while True:
+        site = next_inline_site(code)
+        if site is None:
+            return code
+        load, call, name = site
+        code = code[:load] + inline_body(code[load + 1:call], name) + code[call + 1:]
+
+
+def next_inline_site(code):
+    # (LOAD_NAME line, CALL_FUNCTION line, name) of the first call to inline
+    for i, line in enumerate(code):
+        op = split(line)
+        if op is None or op[0] not in ('LOAD_NAME', 'LOAD_GLOBAL') or op[1] not in functions:
+            continue
+        call = call_end(code, i, len(code))
+        if call != -1 and int(split(code[call])[1]) == len(functions[op[1]][0]):
+            return i, call, op[1]
+    return None
+
+
+def inline_body(arguments, name):
+    params, body = functions[name]
+    copy = new_temp(name)
+    end = f'END_INLINE{copy}'
+
+    def rename(line):
+        op, arg = split(line)
+        if op.endswith(':'):
+            return f'{op[:-1]}{copy}:'
+        if op in ('LOAD_FAST', 'STORE_FAST'):
+            return f'{op} {copy}_{arg}'
+        if op in JUMP_OPS:
+            return f'{op} {arg}{copy}'
+        if op == 'RETURN_VALUE':
+            return f'JUMP_ABSOLUTE {end}'
+        return line
+
+    new_code = [f'# inlined call to {name} ({len(body)} instructions)']
+    new_code.extend(arguments)
+    for param in reversed(params):
+        new_code.append(f'STORE_FAST {copy}_{param}')
+    new_code.extend(rename(line) for line in body)
+    if new_code[-1] == f'JUMP_ABSOLUTE {end}':
+        new_code.pop()
+    new_code.append(f'{end}:')
+    return new_code
+
+
+# ---------------- bounds checks ----------------
+
+# check_index(a, i), emitted by --bounds-check, is removed when the index
+# is known to be inside the array: a constant below the constant size of
+# a, or a variable that is never negative and that the innermost loop
+# around the access tests against the size of a (while (i < n) over an
+# array declared with n elements), with no store to it in between
+
+def eliminate_bounds_checks(code):
+    sizes = array_sizes(code)
+    for start, call, array, index in reversed(bounds_checks(code)):
+        if index_in_bounds(code, start, index, sizes.get(array)):
+            code = code[:start] + code[start + 2:call] + code[call + 1:]
+    return code
+
+
+def bounds_checks(code):
+    # (LOAD_GLOBAL line, CALL_FUNCTION line, array, index instruction)
+    result = []
+    for i, line in enumerate(code):
+        if split(line) != ('LOAD_GLOBAL', 'check_index'):
+            continue
+        array = split(code[i + 1])
+        call = call_end(code, i, len(code))
+        index = [code[j].strip() for j in range(i + 2, call) if split(code[j]) is not None]
+        if array[0] == 'LOAD_FAST' and len(index) == 1:
+            result.append((i, call, array[1], split(index[0])))
+    return result
+
+
+def array_sizes(code):
+    # size of the arrays declared once, as ('LOAD_CONST', n) or
+    # ('LOAD_FAST', variable) when the variable never changes afterwards
+    ins = [(i, split(code[i])) for i in range(len(code)) if split(code[i]) is not None]
+    stored = {}
+    for k, (i, (op, arg)) in enumerate(ins):
+        if op == 'STORE_FAST':
+            stored.setdefault(arg, []).append(k)
+
+    sizes = {}
+    for name, positions in stored.items():
+        k = positions[0]
+        if len(positions) != 1 or k < 3 or ins[k - 1][1] != ('CALL_FUNCTION', '1'):
+            continue
+        callee, size = ins[k - 3][1], ins[k - 2][1]
+        if callee == ('LOAD_GLOBAL', 'array_zero') and size[0] == 'LOAD_CONST':
+            sizes[name] = size
+        elif callee == ('LOAD_GLOBAL', 'array_zero') and size[0] == 'LOAD_FAST' \
+                and all(p < k for p in stored.get(size[1], [])):
+            sizes[name] = size
+        elif size[0] == 'BUILD_LIST':
+            sizes[name] = ('LOAD_CONST', size[1])
+    return sizes
+
+
+def never_negative(code, name, begin, end):
+    # name is >= 0 in the loop code[begin:end]: it is set to a constant >= 0
+    # in the straight-line code before the loop, and the loop only sets it
+    # to constants >= 0 or adds constants >= 0 to it
+    entry = None
+    for i in range(begin - 1, -1, -1):
+        if is_label(code[i]) or code[i].startswith('.begin'):
+            return False
+        if split(code[i]) == ('STORE_FAST', name):
+            entry = i
+            break
+    if entry is None:
+        return False
+
+    previous = []
+    for i in instructions(code, 0, end):
+        op = split(code[i])
+        if op == ('STORE_FAST', name) and i >= entry:
+            constant = previous[-1:] and previous[-1][0] == 'LOAD_CONST' \
+                and previous[-1][1].isdigit()
+            increment = len(previous) >= 3 and previous[-3] == ('LOAD_FAST', name) \
+                and previous[-2][0] == 'LOAD_CONST' and previous[-2][1].isdigit() \
+                and previous[-1] == ('BINARY_ADD', None)
+            if not (constant or increment and i > begin):
+                return False
+        previous.append(op)
+    return True
+
+
+def index_in_bounds(code, start, index, size):
+    if size is None:
+        return False
+    if index[0] == 'LOAD_CONST':
+        return size[0] == 'LOAD_CONST' and int(index[1]) < int(size[1])
+    if index[0] != 'LOAD_FAST':
+        return False
+
+    enclosing = [loop for loop in loops(code) if loop[1] < start < loop[2]]
+    if not enclosing:
+        return False
+    name, begin, end = enclosing[-1]
+    if not never_negative(code, index[1], begin, end):
+        return False
+    names, _ = stores(code, begin, start)
+    if index[1] in names:
+        return False
+
+    # guard and bottom test: LOAD_FAST i, bound, COMPARE_OP <, jump
+    test = [split(code[i]) for i in instructions(code, begin - 1, -1)[:4]][::-1]
+    bottom = [split(code[i]) for i in instructions(code, end, begin)[:4]][::-1]
+    if test[:3] != bottom[:3] or len(test) < 3 or test[0] != ('LOAD_FAST', index[1]):
+        return False
+    bound, compare = test[1], test[2]
+    if bound[0] == 'LOAD_FAST' and bound[1] in stores(code, begin, end + 1)[0]:
+        return False
+    bound, size = constant(code, bound), constant(code, size)
+    if compare == ('COMPARE_OP', '<'):
+        if bound == size:
+            return True
+        return bound[0] == size[0] == 'LOAD_CONST' and int(bound[1]) <= int(size[1])
+    if compare == ('COMPARE_OP', '<='):
+        return bound[0] == size[0] == 'LOAD_CONST' and int(bound[1]) < int(size[1])
+    return False
+
+
+def constant(code, operand):
+    # ('LOAD_CONST', n) for a variable only ever assigned the constant n
+    if operand[0] != 'LOAD_FAST':
+        return operand
+    ins = [split(line) for line in code if split(line) is not None]
+    stores = [k for k, op in enumerate(ins) if op == ('STORE_FAST', operand[1])]
+    if len(stores) == 1 and ins[stores[0] - 1][0] == 'LOAD_CONST' \
+            and not any(op[0] == '.begin' and operand[1] in op[1].split()[1:] for op in ins):
+        return ins[stores[0] - 1]
+    return operand
+
+
+def instructions(code, start, stop):
+    # indexes of the instructions from start towards stop (exclusive)
+    step = 1 if stop > start else -1
+    return [i for i in range(start, stop, step) if split(code[i]) is not None]
+
+
+def counting_loop(code, name, begin, end):
+    # (i, bound, comparison, body) of a rotated loop tested with
+    # i <comparison> bound, where bound is a literal or a variable and body
+    # the (opcode, argument) of its instructions; None for other loops
+    label = name[len('DO_'):]
+    body = [split(code[k]) for k in instructions(code, begin + 1, end + 1)]
+    if body[-5:-4] != [(label + ':', None)]:
+        return None
+    index, bound, comparison, _ = body[-4:]
+    if index[0] != 'LOAD_FAST' or bound[0] not in ('LOAD_CONST', 'LOAD_FAST') \
+            or bound == index or comparison[0] != 'COMPARE_OP':
+        return None
+    return index[1], ' '.join(bound), comparison[1], body[:-5]
+
+
+# ---------------- loop idioms ----------------
+
+# while loops of exactly one of these shapes, with i < bound as the test
+# and i = i + 1 as the last statement, become a single call to a runtime
+# helper that works on the whole slice a[i:bound] at once:
+#   s = s + a[i];   ->  s = s + array_sum(a, i, bound)
+#   a[i] = v;       ->  array_fill(a, i, bound, v)      (v constant or variable)
+#   a[i] = b[i];    ->  array_copy(a, b, i, bound)
+# the helpers fall back to an element by element loop when the slice is
+# not entirely inside the arrays, so errors happen as in the loop
+
+def replace_idioms(code):
+    for name, _, _ in loops(code):
+        begin = find(code, name + ':')
+        end = find(code, 'POP_JUMP_IF_TRUE ' + name, begin)
+        if begin < 0:
+            # inside a loop already replaced
+            continue
+        replacement = loop_idiom(code, name, begin, end)
+        if replacement is not None:
+            code = code[:begin] + replacement + code[end + 1:]
+    return code
+
+
+def loop_idiom(code, name, begin, end):
+    # the lines replacing code[begin:end + 1], or None
+    loop = counting_loop(code, name, begin, end)
+    if loop is None:
+        return None
+    i, bound, comparison, body = loop
+    index = ('LOAD_FAST', i)
+    if comparison != '<' \
+            or body[-4:] != [index, ('LOAD_CONST', '1'), ('BINARY_ADD', None), ('STORE_FAST', i)]:
+        return None
+    body = body[:-4]
+    operands = [arg for op, arg in body if op == 'LOAD_FAST']
+
+    if [op for op, _ in body] == ['LOAD_FAST', 'LOAD_FAST', 'LOAD_FAST', 'BINARY_SUBSCR',
+                                  'BINARY_ADD', 'STORE_FAST'] \
+            and body[2] == index and body[5][1] == operands[0] \
+            and len({operands[0], operands[1], i, bound.split()[1]}) == 4:
+        # s = s + a[i];
+        total, array = operands[:2]
+        result = [f'LOAD_FAST {total}', 'LOAD_GLOBAL array_sum', f'LOAD_FAST {array}',
+                  f'LOAD_FAST {i}', bound, 'CALL_FUNCTION 3', 'BINARY_ADD',
+                  f'STORE_FAST {total}']
+    elif [op for op, _ in body] in (['LOAD_FAST', 'LOAD_FAST', 'LOAD_CONST', 'ROT_THREE', 'STORE_SUBSCR'],
+                                    ['LOAD_FAST', 'LOAD_FAST', 'LOAD_FAST', 'ROT_THREE', 'STORE_SUBSCR']) \
+            and body[1] == index and len(set(operands)) == len(operands):
+        # a[i] = v;
+        result = ['LOAD_GLOBAL array_fill', f'LOAD_FAST {operands[0]}', f'LOAD_FAST {i}',
+                  bound, ' '.join(body[2]), 'CALL_FUNCTION 4', 'POP_TOP']
+    elif [op for op, _ in body] == ['LOAD_FAST', 'LOAD_FAST', 'LOAD_FAST', 'LOAD_FAST',
+                                    'BINARY_SUBSCR', 'ROT_THREE', 'STORE_SUBSCR'] \
+            and body[1] == index and body[3] == index \
+            and len({operands[0], operands[2], i}) == 3:
+        # a[i] = b[i];
+        result = ['LOAD_GLOBAL array_copy', f'LOAD_FAST {operands[0]}', f'LOAD_FAST {operands[2]}',
+                  f'LOAD_FAST {i}', bound, 'CALL_FUNCTION 4', 'POP_TOP']
+    else:
+        return None
+    # the loop only runs when i < bound and leaves i equal to bound
+    helper = next(arg for op, arg in map(split, result) if op == 'LOAD_GLOBAL')
+    return [f'# {name} replaced by {helper}'] + result + [bound, f'STORE_FAST {i}']
+
+
+# ---------------- vectorization ----------------
+
+# while loops with i < bound as the test, i = i + 1 as the last statement
+# and before it only statements a[i] = expression, where the expression is
+# made of literals, variables not written by the loop, i, elements x[i] and
+# + - * (and / % by a non-zero literal), have no dependence between
+# iterations: each one only touches element i. a copy of the loop computing
+# every statement over the slice [i:bound] runs before it when the arrays
+# are numpy arrays (runtime.vectorizable), and the loop runs otherwise:
+#       POP_JUMP_IF_FALSE NOT_WHILE_n
+#       <vectorizable(i, bound, arrays...)>
+#       POP_JUMP_IF_FALSE SCALAR_WHILE_n
+#       <a[i:bound] = expression over slices> ...
+#       JUMP_ABSOLUTE NOT_WHILE_n
+#   SCALAR_WHILE_n:
+#   DO_WHILE_n:
+#       <original loop>
+
+def vectorize_loops(code):
+    for name, _, _ in loops(code):
+        begin = find(code, name + ':')
+        end = find(code, 'POP_JUMP_IF_TRUE ' + name, begin)
+        if begin < 0:
+            continue
+        vector = vector_loop(code, name, begin, end)
+        if vector is not None:
+            code = code[:begin] + vector + code[begin:]
+    return code
+
+
+def vector_loop(code, name, begin, end):
+    # the lines of the vectorized loop, or None
+    loop = counting_loop(code, name, begin, end)
+    if loop is None:
+        return None
+    i, bound, comparison, body = loop
+    index = ('LOAD_FAST', i)
+    if comparison != '<' or not body[:-4] \
+            or body[-4:] != [index, ('LOAD_CONST', '1'), ('BINARY_ADD', None), ('STORE_FAST', i)]:
+        return None
+    body = body[:-4]
+    label = name[len('DO_'):]
+
+    arrays = []
+    result = []
+    statement = []
+    for op, arg in body:
+        statement.append((op, arg))
+        if op != 'STORE_SUBSCR':
+            continue
+        # a[i] = expression;
+        if len(statement) < 5 or statement[0][0] != 'LOAD_FAST' or statement[0] == index \
+                or statement[1] != index or statement[-2] != ('ROT_THREE', None):
+            return None
+        expression = vector_expression(statement[2:-2], index, bound, arrays)
+        if expression is None:
+            return None
+        arrays.append(statement[0][1])
+        result += [f'LOAD_FAST {statement[0][1]}', f'LOAD_FAST {i}', bound, 'BUILD_SLICE 2'] \
+            + expression + ['ROT_THREE', 'STORE_SUBSCR']
+        statement = []
+    if statement:
+        return None
+
+    arrays = list(dict.fromkeys(arrays))
+    scalar = 'SCALAR_' + label
+    return [f'# {name} vectorized', 'LOAD_GLOBAL vectorizable', f'LOAD_FAST {i}', bound] \
+        + [f'LOAD_FAST {array}' for array in arrays] \
+        + [f'CALL_FUNCTION {len(arrays) + 2}', f'POP_JUMP_IF_FALSE {scalar}'] \
+        + result + [bound, f'STORE_FAST {i}', 'JUMP_ABSOLUTE NOT_' + label, scalar + ':']
+
+
+def vector_expression(expression, index, bound, arrays):
+    # the expression computed over slices, adding the arrays read to
+    # arrays, or None
+    result = []
+    for k, (op, arg) in enumerate(expression):
+        following = expression[k + 1] if k + 1 < len(expression) else None
+        if (op, arg) == index:
+            if following == ('BINARY_SUBSCR', None):
+                # x[i] -> x[i:bound]
+                if k == 0 or expression[k - 1][0] != 'LOAD_FAST' or expression[k - 1] == index:
+                    return None
+                arrays.append(expression[k - 1][1])
+                result += [f'LOAD_FAST {arg}', bound, 'BUILD_SLICE 2']
+            else:
+                result += ['LOAD_GLOBAL array_range', f'LOAD_FAST {arg}', bound, 'CALL_FUNCTION 2']
+        elif op == 'BINARY_SUBSCR':
+            if expression[k - 1] != index:
+                return None
+            result.append(op)
+        elif op in DIV_OPS:
+            if expression[k - 1][0] != 'LOAD_CONST' or int(expression[k - 1][1]) == 0:
+                return None
+            result.append(op)
+        elif op in ('BINARY_ADD', 'BINARY_SUBTRACT', 'BINARY_MULTIPLY'):
+            result.append(op)
+        elif op == 'LOAD_CONST' and arg.lstrip('-').isdigit() or op == 'LOAD_FAST':
+            # variables other than i are not written by the loop
+            result.append(f'{op} {arg}')
+        else:
+            return None
+    return result
+
+
+# ---------------- closed-form loops ----------------
+
+# a loop tested with i < bound (<=, >, >=), where bound does not change in
+# it, whose body is made of assignments only:
+#   i = i + c (or i - c)  once, c a literal going towards bound
+#   v = e  at most once for each v, where e is p + q * i or v + p + q * i,
+#       p and q built from literals and variables the loop does not write
+#       (any operator between them, only + - * with i and v)
+# runs trip = number of iterations times, which is known when it starts
+# (rotated loops are only entered with the test true). each v then gets
+# its final value directly: v + trip * p + q * (sum of the values of i),
+# or p + q * i for the last value of i
+
+def evaluate_loops(code):
+    # inner loops first, so their outer loops may be evaluated too
+    for name, _, _ in reversed(loops(code)):
+        begin = find(code, name + ':')
+        end = find(code, 'POP_JUMP_IF_TRUE ' + name, begin)
+        closed = closed_form(code, name, begin, end)
+        if closed is not None:
+            code = code[:begin] + closed + code[end + 1:]
+    return code
+
+
+def closed_form(code, name, begin, end):
+    # the lines computing the final values of the loop, or None
+    loop = counting_loop(code, name, begin, end)
+    if loop is None:
+        return None
+    i, bound, comparison, body = loop
+
+    # split the body into assignments (variable, expression)
+    statements = []
+    expression = []
+    for op, arg in body:
+        if op == 'STORE_FAST':
+            if not expression or any(v == arg for v, _ in statements):
+                return None
+            statements.append((arg, expression))
+            expression = []
+        elif op in PURE_OPS or op == 'BINARY_SUBSCR' or op == 'LOAD_FAST' \
+                or op == 'LOAD_CONST' and arg.lstrip('-').isdigit():
+            expression.append((op, arg))
+        else:
+            return None
+    if expression:
+        return None
+    stored = {v for v, _ in statements}
+    if bound.split()[1] in stored:
+        return None
+
+    # i = i + c
+    step = None
+    for k, (v, expression) in enumerate(statements):
+        if v == i:
+            if len(expression) != 3 or expression[0] != ('LOAD_FAST', i) \
+                    or expression[1][0] != 'LOAD_CONST' \
+                    or expression[2][0] not in ('BINARY_ADD', 'BINARY_SUBTRACT'):
+                return None
+            step = int(expression[1][1]) * (1 if expression[2][0] == 'BINARY_ADD' else -1)
+            incremented = k
+    if not step or comparison not in ('<', '<=', '>', '>=') \
+            or comparison in ('<', '<=') and step < 0 or comparison in ('>', '>=') and step > 0:
+        return None
+
+    trip = new_temp('trip')
+    total = new_temp('sum')
+    # literals are never negative in pyasm: i moves by size with along
+    size = abs(step)
+    along = 'BINARY_ADD' if step > 0 else 'BINARY_SUBTRACT'
+    # distance to bound divided by size, rounded up, plus 1 when the
+    # bound itself is reached
+    if step > 0:
+        result = [bound, f'LOAD_FAST {i}', 'BINARY_SUBTRACT']
+    else:
+        result = [f'LOAD_FAST {i}', bound, 'BINARY_SUBTRACT']
+    if comparison in ('<', '>'):
+        result += [f'LOAD_CONST {size - 1}', 'BINARY_ADD', f'LOAD_CONST {size}', 'BINARY_FLOOR_DIVIDE']
+    else:
+        result += [f'LOAD_CONST {size}', 'BINARY_FLOOR_DIVIDE', 'LOAD_CONST 1', 'BINARY_ADD']
+    result = [f'# {name} evaluated in closed form'] + result + [f'STORE_FAST {trip}']
+    # sum of the values of i before it is incremented:
+    # trip * i + step * trip * (trip - 1) / 2
+    sums = [f'LOAD_FAST {trip}', f'LOAD_FAST {i}', 'BINARY_MULTIPLY', f'LOAD_CONST {size}',
+            f'LOAD_FAST {trip}', f'LOAD_FAST {trip}', 'LOAD_CONST 1', 'BINARY_SUBTRACT',
+            'BINARY_MULTIPLY', 'LOAD_CONST 2', 'BINARY_FLOOR_DIVIDE', 'BINARY_MULTIPLY',
+            along, f'STORE_FAST {total}']
+    # i in the last iteration
+    last = [f'LOAD_FAST {i}', f'LOAD_FAST {trip}', 'LOAD_CONST 1', 'BINARY_SUBTRACT',
+            f'LOAD_CONST {size}', 'BINARY_MULTIPLY', along]
+    # i after the last increment
+    final = [f'LOAD_FAST {i}', f'LOAD_FAST {trip}', f'LOAD_CONST {size}', 'BINARY_MULTIPLY', along]
+
+    updates = []
+    for k, (v, expression) in enumerate(statements):
+        if v == i:
+            continue
+        after = k > incremented
+        if set(arg for op, arg in expression if op == 'LOAD_FAST') - {v, i} & stored:
+            return None
+        affine = affine_parts(expression, i, v)
+        if affine is None or affine[2] not in (0, 1):
+            return None
+        p, q, accumulates = affine
+        if accumulates:
+            # v = v + p + q * i
+            update = [f'LOAD_FAST {v}']
+            if p is not None:
+                update += p + [f'LOAD_FAST {trip}', 'BINARY_MULTIPLY', 'BINARY_ADD']
+            if q is not None:
+                update += q + [f'LOAD_FAST {total}']
+                if after:
+                    update += [f'LOAD_CONST {size}', f'LOAD_FAST {trip}', 'BINARY_MULTIPLY', along]
+                update += ['BINARY_MULTIPLY', 'BINARY_ADD']
+        else:
+            # v = p + q * i, the value of the last iteration
+            update = []
+            for op, arg in expression:
+                if (op, arg) == ('LOAD_FAST', i):
+                    update += final if after else last
+                else:
+                    update.append(f'{op} {arg}' if arg is not None else op)
+        updates += update + [f'STORE_FAST {v}']
+
+    if any(line == f'LOAD_FAST {total}' for line in updates):
+        result += sums
+    return result + updates + final + [f'STORE_FAST {i}']
+
+
+def affine_parts(expression, i, v):
+    # (p, q, r) with expression = p + q * i + r * v, p and q the lines
+    # computing them or None for zero and r an integer; None when the
+    # expression is not of this form
+    stack = []
+    for op, arg in expression:
+        if (op, arg) == ('LOAD_FAST', i):
+            stack.append((None, ['LOAD_CONST 1'], 0))
+        elif (op, arg) == ('LOAD_FAST', v):
+            stack.append((None, None, 1))
+        elif op in ('LOAD_FAST', 'LOAD_CONST'):
+            stack.append(([f'{op} {arg}'], None, 0))
+        else:
+            (p1, q1, r1), (p2, q2, r2) = stack[-2:]
+            del stack[-2:]
+            if op in ('BINARY_ADD', 'BINARY_SUBTRACT'):
+                stack.append((combine(p1, p2, op), combine(q1, q2, op),
+                               r1 + r2 if op == 'BINARY_ADD' else r1 - r2))
+            elif r1 or r2 or p1 is None and q1 is None or p2 is None and q2 is None:
+                return None
+            elif op == 'BINARY_MULTIPLY' and (q1 is None or q2 is None):
+                if q1 is None:
+                    p1, q1, p2, q2 = p2, q2, p1, q1
+                # (p1 + q1 * i) * p2
+                stack.append((p1 and p1 + p2 + [op], q1 and q1 + p2 + [op], 0))
+            elif q1 is None and q2 is None:
+                stack.append((p1 + p2 + [op], None, 0))
+            else:
+                return None
+    return stack[0]
+
+
+def combine(x, y, op):
+    # x op y for + and -, with None for zero
+    if y is None:
+        return x
+    if x is None:
+        return y if op == 'BINARY_ADD' else ['LOAD_CONST 0'] + y + [op]
+    return x + y + [op]
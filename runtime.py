@@ -1,4 +1,155 @@
+import atexit
+import mmap
+import sys
+import tempfile
+from array import array
+
+# imported by use_numpy: it takes longer to import than the compiler itself
+numpy = None
+
+# representation of Ç arrays, chosen when the program runs:
+#   'list'     Python list of ints (default)
+#   'compact'  array('q'), 8 bytes per element; storing a value outside
+#              the signed 64-bit range raises OverflowError
+#   'numpy'    numpy int64 ndarray; loops vectorized by optimizer.py run as
+#              whole-array operations, which wrap around on overflow. an
+#              element is read as an int, so other code behaves as with
+#              'compact' (x / 0 raises, storing a value outside the signed
+#              64-bit range raises OverflowError)
+arrays = 'list'
+
+# arrays declared with at least mmap_threshold elements live in a mapped
+# region seen as signed 64-bit integers (same limits as 'compact'). pages
+# are only allocated when touched; with mmap_dir set the region is backed
+# by a temporary file there, so it may be larger than the memory
+mmap_threshold = None
+mmap_dir = None
+
+def use_numpy():
+    # 'numpy' arrays; raises ImportError without numpy
+    global numpy, arrays, Int64Array
+    import numpy
+
+    class Int64Array(numpy.ndarray):
+        # reads an element as an int and a slice as an Int64Array
+        def __getitem__(self, index):
+            value = numpy.ndarray.__getitem__(self, index)
+            return int(value) if isinstance(value, numpy.integer) else value
+
+    arrays = 'numpy'
+
 def array_zero(n):
     # print('This is arbitrary Python code!')
+    if mmap_threshold is not None and n >= mmap_threshold and n > 0:
+        if arrays == 'numpy':
+            return numpy.asarray(array_mmap(n)).view(Int64Array)
+        return array_mmap(n)
+    if arrays == 'numpy':
+        return numpy.zeros(n, dtype=numpy.int64).view(Int64Array)
+    if arrays == 'compact':
+        return array('q', bytes(8 * n))
     return [0] * n
 
+def array_mmap(n):
+    if mmap_dir is None:
+        region = mmap.mmap(-1, 8 * n)
+    else:
+        with tempfile.TemporaryFile(dir=mmap_dir) as f:
+            f.truncate(8 * n)
+            region = mmap.mmap(f.fileno(), 8 * n)
+    return memoryview(region).cast('q')
+
+def array_of(values):
+    # array initialized with {...}
+    if arrays == 'numpy':
+        return numpy.array(values, dtype=numpy.int64).view(Int64Array)
+    if arrays == 'compact':
+        return array('q', values)
+    return values
+
+def check_index(a, i):
+    # C-style bounds check emitted by compiler.py --bounds-check
+    if 0 <= i < len(a):
+        return i
+    raise IndexError(f'array index {i} out of bounds for size {len(a)}')
+
+# loops replaced by optimizer.py replace_idioms. when the slice is not
+# entirely inside the arrays they run the original loop instead, so
+# negative indexes and index errors behave the same
+
+def array_sum(a, start, stop):
+    if 0 <= start and stop <= len(a):
+        if numpy is not None and isinstance(a, numpy.ndarray):
+            return int(a[start:stop].sum())
+        return sum(a[start:stop])
+    total = 0
+    while start < stop:
+        total = total + a[start]
+        start = start + 1
+    return total
+
+def array_fill(a, start, stop, value):
+    if 0 <= start and stop <= len(a):
+        if isinstance(a, list):
+            a[start:stop] = [value] * (stop - start)
+        elif numpy is not None and isinstance(a, numpy.ndarray):
+            a[start:stop] = value
+        else:
+            a[start:stop] = array('q', [value]) * (stop - start)
+        return
+    while start < stop:
+        a[start] = value
+        start = start + 1
+
+def array_copy(a, b, start, stop):
+    if 0 <= start and stop <= min(len(a), len(b)):
+        if isinstance(a, list) or numpy is not None and isinstance(a, numpy.ndarray):
+            a[start:stop] = b[start:stop]
+        else:
+            a[start:stop] = array('q', b[start:stop])
+        return
+    while start < stop:
+        a[start] = b[start]
+        start = start + 1
+
+# loops vectorized by optimizer.py vectorize_loops run as slice operations
+# when every array they use is a numpy array containing a[start:stop];
+# otherwise the original loop runs
+
+def vectorizable(start, stop, *arrays):
+    return numpy is not None and 0 <= start and all(
+        isinstance(a, numpy.ndarray) and stop <= len(a) for a in arrays)
+
+def array_range(start, stop):
+    # the values of the loop variable, for vectorized loops that use it
+    return numpy.arange(start, stop, dtype=numpy.int64)
+
+# printf output is kept in a buffer and written when it reaches
+# BUFFER_SIZE characters or when the program exits. interactive programs
+# (stdout is a terminal, or assembler.py --unbuffered) write on every call
+
+BUFFER_SIZE = 1 << 20
+unbuffered = sys.stdout.isatty()
+
+_buffer = []
+_buffered = 0
+
+def printf(text):
+    global _buffered
+    if unbuffered:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        return
+    _buffer.append(text)
+    _buffered += len(text)
+    if _buffered >= BUFFER_SIZE:
+        _flush()
+
+def _flush():
+    global _buffered
+    sys.stdout.write(''.join(_buffer))
+    sys.stdout.flush()
+    _buffer.clear()
+    _buffered = 0
+
+atexit.register(_flush)
@@ -31,10 +31,11 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 # -----------------------------------------------------------------------------
 
-__all__ = ['Lexer', 'LexerStateChange']
+__all__ = ['Lexer', 'LexerStateChange', 'TokenArrays']
 
 import re
 import copy
+from array import array
 
 class LexError(Exception):
     '''
@@ -77,6 +78,45 @@ class Token(object):
     def __repr__(self):
         return f'Token(type={self.type!r}, value={self.value!r}, lineno={self.lineno}, index={self.index}, end={self.end})'
 
+# What tokenize_all() does with the groups of Lexer._bulk_regex() that
+# don't add a token of a known type
+_RULE, _LITERAL, _ERROR, _END, _REMAP = -1, -2, -3, -4, -5
+_BULK_GROUPS = { '_literal': _LITERAL, '_error': _ERROR, '_end': _END }
+
+class TokenArrays(object):
+    '''
+    The tokens of a whole text, as returned by Lexer.tokenize_all().
+    Token i has type type_names[types[i]], line number linenos[i] and
+    value text[starts[i]:ends[i]], or values[i] when a token function
+    or error() gave it another value.  Iterating gives Token objects.
+    '''
+    __slots__ = ('text', 'type_names', 'types', 'starts', 'ends', 'linenos', 'values')
+
+    def __init__(self, text):
+        self.text = text
+        self.type_names = []
+        self.types = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.linenos = array('i')
+        self.values = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        text = self.text
+        type_names = self.type_names
+        values = self.values
+        for i, (kind, start, end, lineno) in enumerate(zip(self.types, self.starts, self.ends, self.linenos)):
+            tok = Token()
+            tok.type = type_names[kind]
+            tok.value = values[i] if values and i in values else text[start:end]
+            tok.lineno = lineno
+            tok.index = start
+            tok.end = end
+            yield tok
+
 class TokenStr(str):
     @staticmethod
     def __new__(cls, value, key=None, remap=None):
@@ -455,6 +495,220 @@ class Lexer(metaclass=LexerMeta):
             self.index = index
             self.lineno = lineno
 
+    @classmethod
+    def _bulk_regex(cls):
+        # The master regular expression extended for tokenize_all(), so that
+        # every piece of the text matches: the ignored characters before a
+        # token, then the rules, a literal, any other character (an error)
+        # or the end of the text.  The end stops the ignored characters from
+        # giving back a character to the rules.  The added parts are
+        # case-sensitive, like the checks in tokenize()
+        if '_bulk_re' not in vars(cls):
+            parts = [ cls._master_re.pattern ] if cls._master_re else [ ]
+            if cls.literals:
+                parts.append(f'(?P<_literal>(?-i:[{re.escape("".join(sorted(cls.literals)))}]))')
+            parts += [ r'(?P<_error>[\s\S])', r'(?P<_end>\Z)' ]
+            ignore = f'(?-i:[{re.escape(cls.ignore)}]*)' if cls.ignore else ''
+            cls._bulk_re = cls.regex_module.compile(ignore + '(?:' + '|'.join(parts) + ')', cls.reflags)
+        return cls._bulk_re
+
+    def tokenize_all(self, text, lineno=1, index=0, stop=None):
+        '''
+        Tokenize all of text, with a single regular expression search over
+        it instead of a match per token, and return a TokenArrays with the
+        tokens tokenize() would yield.  Token functions and error() are
+        called the same way and may change the lexer state; the backtracking
+        functions mark(), accept() and reject() are only in tokenize().
+        With stop, lexing stops before the first token (or ignored text)
+        ending after stop, or at text no rule matches, which more text could
+        make a token of; self.index is where it stopped.
+        '''
+        self.__set_state = None
+        self.text = text
+        result = TokenArrays(text)
+        type_names = result.type_names
+        types = result.types
+        starts = result.starts
+        ends = result.ends
+        linenos = result.linenos
+        type_ids = { }
+
+        def type_id(name):
+            if name not in type_ids:
+                type_ids[name] = len(type_names)
+                type_names.append(name)
+            return type_ids[name]
+
+        def add(tok):
+            # A token made or changed by a function
+            result.values[len(types)] = tok.value
+            types.append(type_id(tok.type))
+            starts.append(tok.index)
+            ends.append(tok.end)
+            linenos.append(tok.lineno)
+
+        limit = len(text) if stop is None else stop
+        cls = None
+        try:
+            while True:
+                if type(self) is not cls:
+                    cls = type(self)
+                    bulk_re = cls._bulk_regex()
+                    group_names = { group: name for name, group in bulk_re.groupindex.items() }
+                    # For each group of bulk_re, the type id of the token it
+                    # adds, or what else to do (_RULE, _LITERAL, _ERROR, _END,
+                    # _REMAP).  A remapping only giving plain tokens is looked
+                    # up in a table of type ids, default under the key None
+                    actions = [ None ] * (bulk_re.groups + 1)
+                    remap_ids = { }
+                    for group, name in group_names.items():
+                        if name in cls._token_funcs or name in cls._ignored_tokens:
+                            actions[group] = _RULE
+                        elif name in cls._remapping:
+                            kinds = cls._remapping[name]
+                            if any(kind in cls._token_funcs or kind in cls._ignored_tokens for kind in kinds.values()):
+                                actions[group] = _RULE
+                            else:
+                                actions[group] = _REMAP
+                                remap_ids[group] = { value: type_id(kind) for value, kind in kinds.items() }
+                                remap_ids[group][None] = type_id(name)
+                        else:
+                            actions[group] = _BULK_GROUPS.get(name) or type_id(name)
+                    for name in sorted(cls.literals):
+                        type_id(name)
+                    _ignored_tokens = cls._ignored_tokens
+                    _token_funcs = cls._token_funcs
+                    _remapping = cls._remapping
+
+                for m in bulk_re.finditer(text, index):
+                    if m.end() > limit:
+                        # Left for a call with more text
+                        index = m.start()
+                        break
+
+                    group = m.lastindex
+                    action = actions[group]
+                    if action >= 0:
+                        types.append(action)
+                        start, end = m.span(group)
+                        starts.append(start)
+                        ends.append(end)
+                        linenos.append(lineno)
+
+                    elif action == _LITERAL:
+                        start, end = m.span(group)
+                        types.append(type_ids[text[start]])
+                        starts.append(start)
+                        ends.append(end)
+                        linenos.append(lineno)
+
+                    elif action == _REMAP:
+                        start, end = m.span(group)
+                        ids = remap_ids[group]
+                        types.append(ids.get(text[start:end], ids[None]))
+                        starts.append(start)
+                        ends.append(end)
+                        linenos.append(lineno)
+
+                    elif action == _RULE:
+                        # A rule with a remapping, a function or ignored
+                        start, end = m.span(group)
+                        kind = group_names[group]
+                        if kind in _remapping:
+                            kind = _remapping[kind].get(text[start:end], kind)
+
+                        if kind in _token_funcs:
+                            tok = Token()
+                            tok.type = kind
+                            tok.value = text[start:end]
+                            tok.lineno = lineno
+                            tok.index = start
+                            tok.end = end
+                            self.index = end
+                            self.lineno = lineno
+                            tok = _token_funcs[kind](self, tok)
+                            lineno = self.lineno
+                            if tok and tok.type not in _ignored_tokens:
+                                add(tok)
+                            if self.index != end or type(self) is not cls:
+                                # Go on from where the function left the lexer
+                                index = self.index
+                                break
+
+                        elif kind not in _ignored_tokens:
+                            types.append(type_id(kind))
+                            starts.append(start)
+                            ends.append(end)
+                            linenos.append(lineno)
+
+                    elif action == _ERROR:
+                        if stop is not None:
+                            # Left for a call with more text
+                            index = m.start(group)
+                            break
+                        tok = Token()
+                        tok.lineno = lineno
+                        tok.index = index = m.start(group)
+                        tok.type = 'ERROR'
+                        tok.value = text[index:]
+                        self.index = index
+                        self.lineno = lineno
+                        tok = self.error(tok)
+                        if tok is not None:
+                            tok.end = self.index
+                            add(tok)
+                        index = self.index
+                        lineno = self.lineno
+                        break
+                else:
+                    index = len(text)
+                    break
+
+                if m.end() > limit or action == _ERROR and stop is not None:
+                    break
+
+        # Set the final state of the lexer before exiting (even if exception)
+        finally:
+            self.index = index
+            self.lineno = lineno
+        return result
+
+    def tokenize_stream(self, chunks, lineno=1, margin=65536):
+        '''
+        Tokenize a text given in pieces, such as the blocks read from a
+        file, and yield the tokens tokenize() would yield for the whole
+        text, with their index and end in it.  Only the text not tokenized
+        yet is kept: each piece is added to it and tokenized by
+        tokenize_all() up to margin characters before its end.  When that
+        stops earlier, at a token longer than margin or at text no rule
+        matches, it is tried again once the text kept has doubled, and
+        error() is called at the end of the text at the latest.  Token
+        functions and error() see the text kept and self.index in it.
+        '''
+        text = ''
+        offset = 0                      # Index of text in the whole text
+        index = 0
+        wanted = 0                      # Length of text to try again with
+        chunks = iter(chunks)
+        while True:
+            chunk = next(chunks, None)
+            text = text[index:] + (chunk or '')
+            index = 0
+            if chunk is not None and len(text) < wanted:
+                continue
+            tokens = self.tokenize_all(text, lineno, 0, None if chunk is None else len(text) - margin)
+            index = self.index
+            lineno = self.lineno
+            for tok in tokens:
+                tok.index += offset
+                tok.end += offset
+                yield tok
+            offset += index
+            if chunk is None:
+                self.index = offset
+                return
+            wanted = 2 * (len(text) - index) if index < len(text) - margin else 0
+
     # Default implementations of the error handler. May be changed in subclasses
     def error(self, t):
         raise LexError(f'Illegal character {t.value[0]!r} at index {self.index}', t.value, self.index)
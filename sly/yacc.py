@@ -33,6 +33,7 @@
 
 import sys
 import inspect
+from array import array
 from collections import OrderedDict, defaultdict, Counter
 
 __all__        = [ 'Parser' ]
@@ -87,6 +88,8 @@ class SlyLogger(object):
 # ----------------------------------------------------------------------
 
 class YaccSymbol:
+    __slots__ = ('type', 'value', 'lineno', 'index', 'end')
+
     def __str__(self):
         return self.type
 
@@ -99,29 +102,43 @@ class YaccSymbol:
 # .value attribute of the underlying YaccSymbol object.
 # The lineno() method returns the line number of a given
 # item (or 0 if not defined).   
+#
+# Each Production has a subclass of it (Production.pslice_class) with
+# _len set to the number of symbols and a property for every symbol
+# name. When a rule function runs, those symbols are the top _len
+# entries of the symbol stack, so nothing is copied on a reduction.
 # ----------------------------------------------------------------------
 
 class YaccProduction:
-    __slots__ = ('_slice', '_namemap', '_stack')
-    def __init__(self, s, stack=None):
-        self._slice = s
-        self._namemap = { }
+    __slots__ = ('_stack',)
+    _namemap = { }
+    _len = 0
+
+    def __init__(self, stack=None):
         self._stack = stack
 
+    @property
+    def _slice(self):
+        return self._stack[len(self._stack) - self._len:]
+
     def __getitem__(self, n):
         if n >= 0:
-            return self._slice[n].value
+            if n >= self._len:
+                raise IndexError('production index out of range')
+            return self._stack[n - self._len].value
         else:
             return self._stack[n].value
 
     def __setitem__(self, n, v):
         if n >= 0:
-            self._slice[n].value = v
+            if n >= self._len:
+                raise IndexError('production index out of range')
+            self._stack[n - self._len].value = v
         else:
             self._stack[n].value = v
 
     def __len__(self):
-        return len(self._slice)
+        return self._len
 
     @property
     def lineno(self):
@@ -150,7 +167,7 @@ class YaccProduction:
     
     def __getattr__(self, name):
         if name in self._namemap:
-            return self._namemap[name](self._slice)
+            return self._namemap[name](self)
         else:
             nameset = '{' + ', '.join(self._namemap) + '}'
             raise AttributeError(f'No symbol {name}. Must be one of {nameset}.')
@@ -223,7 +240,8 @@ class Production(object):
                 for key in _name_aliases[key]:
                     namecount[key] += 1
 
-        # Now, walk through the names and generate accessor functions
+        # Now, walk through the names and generate accessor functions.
+        # Symbol index is counted from the top of the symbol stack
         nameuse = defaultdict(int)
         namemap = { }
         for index, key in enumerate(self.prod):
@@ -232,7 +250,7 @@ class Production(object):
                 nameuse[key] += 1
             else:
                 k = key
-            namemap[k] = lambda s,i=index: s[i].value
+            namemap[k] = lambda p,i=index-self.len: p._stack[i].value
             if key in _name_aliases:
                 for n, alias in enumerate(_name_aliases[key]):
                     if namecount[alias] > 1:
@@ -241,9 +259,14 @@ class Production(object):
                     else:
                         k = alias
                     # The value is either a list (for repetition) or a tuple for optional 
-                    namemap[k] = lambda s,i=index,n=n: ([x[n] for x in s[i].value]) if isinstance(s[i].value, list) else s[i].value[n]
+                    namemap[k] = lambda p,i=index-self.len,n=n: ([x[n] for x in p._stack[i].value]) if isinstance(p._stack[i].value, list) else p._stack[i].value[n]
 
         self.namemap = namemap
+
+        # Class of the object passed to func, with the names as properties
+        properties = { k: property(f) for k, f in namemap.items() if not hasattr(YaccProduction, k) }
+        self.pslice_class = type('YaccProduction', (YaccProduction,),
+                                 { '__slots__': (), '_namemap': namemap, '_len': self.len, **properties })
                 
         # List of all LR items for the production
         self.lr_items = []
@@ -311,6 +334,7 @@ class Production(object):
 #       len        - Length of the production (number of symbols on right hand side)
 #       lr_after    - List of all productions that immediately follow
 #       lr_before   - Grammar symbol immediately before
+#       lr_number   - Number of the item in the list of all LR items (Grammar.LRItems)
 # -----------------------------------------------------------------------------
 
 class LRItem(object):
@@ -348,6 +372,33 @@ def rightmost_terminal(symbols, terminals):
         i -= 1
     return None
 
+# -----------------------------------------------------------------------------
+# _bit_symbols()
+#
+# Return the list of symbols in a set represented as a bitset, where bit n
+# stands for symbols[n].  Used for the FIRST, FOLLOW and lookahead sets
+# -----------------------------------------------------------------------------
+def _bit_symbols(bits, symbols):
+    result = []
+    while bits:
+        low = bits & -bits
+        result.append(symbols[low.bit_length() - 1])
+        bits ^= low
+    return result
+
+# -----------------------------------------------------------------------------
+# _does_nothing()
+#
+# Return True if func is a grammar rule function with an empty body (pass)
+# -----------------------------------------------------------------------------
+def _nothing(self, p):
+    pass
+
+def _does_nothing(func):
+    code = getattr(func, '__code__', None)
+    return (code is not None and code.co_code == _nothing.__code__.co_code
+            and code.co_consts == _nothing.__code__.co_consts)
+
 # -----------------------------------------------------------------------------
 #                           === GRAMMAR CLASS ===
 #
@@ -386,6 +437,8 @@ class Grammar(object):
 
         self.Follow       = {}      # A dictionary of precomputed FOLLOW(x) symbols
 
+        self.LRItems      = []      # A list of all of the LR items, numbered in order
+
         self.Precedence   = {}      # Precedence rules for each terminal. Contains tuples of the
                                     # form ('right',level) or ('nonassoc', level) or ('left',level)
 
@@ -715,38 +768,50 @@ class Grammar(object):
     # -------------------------------------------------------------------------
     # compute_first()
     #
-    # Compute the value of FIRST1(X) for all symbols
+    # Compute the value of FIRST1(X) for all symbols.  The sets are computed
+    # as bitsets over the terminals, with one more bit for <empty>
     # -------------------------------------------------------------------------
     def compute_first(self):
         if self.First:
             return self.First
 
-        # Terminals:
-        for t in self.Terminals:
-            self.First[t] = [t]
-
-        self.First['$end'] = ['$end']
+        symbols = [*self.Terminals, '$end', '<empty>']
+        bits = { s: 1 << n for n, s in enumerate(symbols) }
+        first = self._first_bits = { s: bits[s] for s in symbols[:-1] }
+        self._empty_bit = bits['<empty>']
 
-        # Nonterminals:
-
-        # Initialize to the empty set:
+        # Nonterminals start from the empty set, then propagate symbols
+        # until no change
         for n in self.Nonterminals:
-            self.First[n] = []
+            first[n] = 0
 
-        # Then propagate symbols until no change:
         while True:
             some_change = False
             for n in self.Nonterminals:
                 for p in self.Prodnames[n]:
-                    for f in self._first(p.prod):
-                        if f not in self.First[n]:
-                            self.First[n].append(f)
-                            some_change = True
+                    f = self._first_set(p.prod)
+                    if f & ~first[n]:
+                        first[n] |= f
+                        some_change = True
             if not some_change:
                 break
 
+        for s, f in first.items():
+            self.First[s] = _bit_symbols(f, symbols)
         return self.First
 
+    # FIRST1(beta) as a bitset, see _first()
+    def _first_set(self, beta):
+        first = self._first_bits
+        empty = self._empty_bit
+        result = 0
+        for x in beta:
+            f = first[x]
+            result |= f & ~empty
+            if not f & empty:
+                return result
+        return result | empty
+
     # ---------------------------------------------------------------------
     # compute_follow()
     #
@@ -763,14 +828,16 @@ class Grammar(object):
         if not self.First:
             self.compute_first()
 
+        symbols = [*self.Terminals, '$end']
+        empty = self._empty_bit
+
         # Add '$end' to the follow list of the start symbol
-        for k in self.Nonterminals:
-            self.Follow[k] = []
+        follow = { k: 0 for k in self.Nonterminals }
 
         if not start:
             start = self.Productions[1].name
 
-        self.Follow[start] = ['$end']
+        follow[start] = 1 << symbols.index('$end')
 
         while True:
             didadd = False
@@ -779,22 +846,18 @@ class Grammar(object):
                 for i, B in enumerate(p.prod):
                     if B in self.Nonterminals:
                         # Okay. We got a non-terminal in a production
-                        fst = self._first(p.prod[i+1:])
-                        hasempty = False
-                        for f in fst:
-                            if f != '<empty>' and f not in self.Follow[B]:
-                                self.Follow[B].append(f)
-                                didadd = True
-                            if f == '<empty>':
-                                hasempty = True
-                        if hasempty or i == (len(p.prod)-1):
+                        f = self._first_set(p.prod[i+1:])
+                        if f & empty:
                             # Add elements of follow(a) to follow(b)
-                            for f in self.Follow[p.name]:
-                                if f not in self.Follow[B]:
-                                    self.Follow[B].append(f)
-                                    didadd = True
+                            f = (f & ~empty) | follow[p.name]
+                        if f & ~follow[B]:
+                            follow[B] |= f
+                            didadd = True
             if not didadd:
                 break
+
+        for k, f in follow.items():
+            self.Follow[k] = _bit_symbols(f, symbols)
         return self.Follow
 
 
@@ -803,7 +866,7 @@ class Grammar(object):
     #
     # This function walks the list of productions and builds a complete set of the
     # LR items.  The LR items are stored in two ways:  First, they are uniquely
-    # numbered and placed in the list _lritems.  Second, a linked list of LR items
+    # numbered (lr_number) and placed in the list LRItems.  Second, a linked list of LR items
     # is built for each production.  For example:
     #
     #   E -> E PLUS E
@@ -814,6 +877,7 @@ class Grammar(object):
     # -----------------------------------------------------------------------------
 
     def build_lritems(self):
+        self.LRItems = []
         for p in self.Productions:
             lastlri = p
             i = 0
@@ -836,6 +900,8 @@ class Grammar(object):
                 lastlri.lr_next = lri
                 if not lri:
                     break
+                lri.lr_number = len(self.LRItems)
+                self.LRItems.append(lri)
                 lr_items.append(lri)
                 lastlri = lri
                 i += 1
@@ -890,7 +956,7 @@ class Grammar(object):
 #
 # Inputs:  X    - An input set
 #          R    - A relation
-#          FP   - Set-valued function
+#          FP   - Set-valued function, the sets being bitsets
 # ------------------------------------------------------------------------------
 
 def digraph(X, R, FP):
@@ -915,9 +981,7 @@ def traverse(x, N, stack, F, X, R, FP):
         if N[y] == 0:
             traverse(y, N, stack, F, X, R, FP)
         N[x] = min(N[x], N[y])
-        for a in F.get(y, []):
-            if a not in F[x]:
-                F[x].append(a)
+        F[x] |= F.get(y, 0)
     if N[x] == d:
         N[stack[-1]] = MAXINT
         F[stack[-1]] = F[x]
@@ -945,9 +1009,8 @@ class LRTable(object):
         self.lr_action     = {}        # Action table
         self.lr_goto       = {}        # Goto table
         self.lr_productions  = grammar.Productions    # Copy of grammar Production array
-        self.lr_goto_cache = {}        # Cache of computed gotos
-        self.lr0_cidhash   = {}        # Cache of closures
-        self._add_count    = 0         # Internal counter used to detect cycles
+        self.lr0_kernels   = {}        # State number of each LR(0) kernel (tuple of item numbers)
+        self.lr0_transitions = []      # LR(0) goto function, a dict symbol -> state for each state
 
         # Diagonistic information filled in by the table generator
         self.state_descriptions = OrderedDict()
@@ -978,95 +1041,168 @@ class LRTable(object):
             if len(rules) == 1 and rules[0] < 0:
                 self.defaulted_states[state] = rules[0]
 
-    # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
+    # Skip the reductions by unit rules (a : b) whose function does nothing.
+    # Where the goto on b leads to a state whose only action is to reduce
+    # by such a rule, go to the state of the goto on a instead.  The symbol
+    # b stays on the stack in place of a.  Used by parsers with
+    # skip_unit_rules set
+    def eliminate_unit_rules(self):
+        unit = {}
+        for state, actions in self.lr_action.items():
+            rules = set(actions.values())
+            if len(rules) == 1:
+                r = rules.pop()
+                if r is not None and r < 0:
+                    p = self.lr_productions[-r]
+                    if p.len == 1 and p.prod[0] in self.grammar.Nonterminals and _does_nothing(p.func):
+                        unit[state] = p.name
+
+        for gotos in self.lr_goto.values():
+            for n, j in gotos.items():
+                seen = set()
+                while j in unit and j not in seen:
+                    seen.add(j)
+                    j = gotos[unit[j]]
+                gotos[n] = j
+
+    # Replace lr_action and lr_goto with packed tables, and drop the caches
+    # used to build them.  Used by parsers with compact_tables set
+    def compact(self):
+        self.pack_tables()
+        self.lr_action = None
+        self.lr_goto = None
+        self.lr0_kernels = None
+        self.lr0_transitions = None
+        self.lr0_after = None
+        self.lr0_initial = None
+
+    # Intern the grammar symbols to small integers and pack the action and
+    # goto tables into arrays by row displacement ("comb" packing).  The
+    # entries of state s are stored at base[s] + symbol in next, with s in
+    # check at the same position.  A position whose check holds another
+    # state is an error (action) or never looked up (goto).
+    def pack_tables(self):
+        symbols = ['$end', *self.grammar.Terminals, *self.grammar.Nonterminals]
+        self.symbol_index = { name: n for n, name in enumerate(symbols) }
+
+        # Symbol number that no row uses, for token types not in the grammar
+        self.unknown_symbol = len(symbols)
+
+        self.action_base, self.action_check, self.action_next = self._pack(self.lr_action)
+        self.goto_base, self.goto_check, self.goto_next = self._pack(self.lr_goto)
+
+        # Left side of each production, as a symbol number (the start
+        # production S' is never reduced)
+        self.lr_lhs = array('i', (self.symbol_index.get(p.name, self.unknown_symbol)
+                                  for p in self.lr_productions))
+
+    def _pack(self, table):
+        nstates = len(self.lr_action)
+        width = self.unknown_symbol + 1
+        base = array('i', [0]) * nstates
+        check = array('i', [-1]) * width
+        next = array('i', [0]) * width
+        used = bytearray(width)
+        first_free = 0
+
+        # Place the fullest rows first, each at the first base where all
+        # of its entries land on free positions
+        rows = sorted(((state, sorted((self.symbol_index[name], value) for name, value in row.items()))
+                       for state, row in table.items() if row), key=lambda r: -len(r[1]))
+        for state, entries in rows:
+            b = max(first_free - entries[0][0], 0)
+            while True:
+                if b + width > len(used):
+                    grow = b + width - len(used)
+                    check.extend(array('i', [-1]) * grow)
+                    next.extend(array('i', [0]) * grow)
+                    used.extend(bytes(grow))
+                if not any(used[b + sym] for sym, _ in entries):
+                    break
+                b += 1
+            base[state] = b
+            for sym, value in entries:
+                used[b + sym] = 1
+                check[b + sym] = state
+                next[b + sym] = value
+            while first_free < len(used) and used[first_free]:
+                first_free += 1
+        return base, check, next
+
+    # Compute the LR(0) closure operation on I, where I is a list of LR(0) item
+    # numbers.  The items added are the first items of the productions of each
+    # nonterminal after a ".", precomputed in lr0_initial
     def lr0_closure(self, I):
-        self._add_count += 1
+        after = self.lr0_after
+        initial = self.lr0_initial
 
         # Add everything in I to J
-        J = I[:]
-        didadd = True
-        while didadd:
-            didadd = False
-            for j in J:
-                for x in j.lr_after:
-                    if getattr(x, 'lr0_added', 0) == self._add_count:
-                        continue
-                    # Add B --> .G to J
-                    J.append(x.lr_next)
-                    x.lr0_added = self._add_count
-                    didadd = True
+        J = list(I)
+        added = set()
+        for j in J:
+            x = after[j]
+            if x in initial and x not in added:
+                # Add B --> .G to J
+                J.extend(initial[x])
+                added.add(x)
 
         return J
 
-    # Compute the LR(0) goto function goto(I,X) where I is a set
-    # of LR(0) items and X is a grammar symbol.   This function is written
-    # in a way that guarantees uniqueness of the generated goto sets
-    # (i.e. the same goto set will never be returned as two different Python
-    # objects).  With uniqueness, we can later do fast set comparisons using
-    # id(obj) instead of element-wise comparison.
-
+    # Compute the LR(0) goto function goto(I,X) where I is the state number
+    # of a set of LR(0) items and X is a grammar symbol.  Returns the state
+    # number of the goto set, or -1 if it is empty
     def lr0_goto(self, I, x):
-        # First we look for a previously cached entry
-        g = self.lr_goto_cache.get((id(I), x))
-        if g:
-            return g
-
-        # Now we generate the goto set in a way that guarantees uniqueness
-        # of the result
-
-        s = self.lr_goto_cache.get(x)
-        if not s:
-            s = {}
-            self.lr_goto_cache[x] = s
-
-        gs = []
-        for p in I:
-            n = p.lr_next
-            if n and n.lr_before == x:
-                s1 = s.get(id(n))
-                if not s1:
-                    s1 = {}
-                    s[id(n)] = s1
-                gs.append(n)
-                s = s1
-        g = s.get('$end')
-        if not g:
-            if gs:
-                g = self.lr0_closure(gs)
-                s['$end'] = g
-            else:
-                s['$end'] = gs
-        self.lr_goto_cache[(id(I), x)] = g
-        return g
+        return self.lr0_transitions[I].get(x, -1)
 
-    # Compute the LR(0) sets of item function
+    # Compute the LR(0) sets of item function.  Each set is found from its
+    # kernel (the items with the "." moved past a symbol) and numbered in
+    # the order it is first reached.  The goto function is kept in
+    # lr0_transitions
     def lr0_items(self):
-        C = [self.lr0_closure([self.grammar.Productions[0].lr_next])]
-        i = 0
-        for I in C:
-            self.lr0_cidhash[id(I)] = i
-            i += 1
+        items = self.grammar.LRItems
+
+        # Symbol after the "." of each item, or None at the end of a production
+        self.lr0_after = [ p.prod[p.lr_index+1] if p.lr_index < p.len - 1 else None for p in items ]
+
+        # The first item of each production of each nonterminal
+        self.lr0_initial = { name: [ p.lr_items[0].lr_number for p in prods ]
+                             for name, prods in self.grammar.Prodnames.items() }
+
+        after = self.lr0_after
+        kernels = self.lr0_kernels
+        transitions = self.lr0_transitions
+
+        kernel = (self.grammar.Productions[0].lr_next.lr_number,)
+        kernels[kernel] = 0
+        C = [self.lr0_closure(kernel)]
 
         # Loop over the items in C and each grammar symbols
-        i = 0
-        while i < len(C):
-            I = C[i]
-            i += 1
-
-            # Collect all of the symbols that could possibly be in the goto(I,X) sets
-            asyms = {}
-            for ii in I:
-                for s in ii.usyms:
-                    asyms[s] = None
-
-            for x in asyms:
-                g = self.lr0_goto(I, x)
-                if not g or id(g) in self.lr0_cidhash:
+        for I in C:
+            # Kernel of goto(I,X) for each symbol X after a "."
+            gotos = {}
+            for j in I:
+                x = after[j]
+                if x is not None:
+                    if x in gotos:
+                        gotos[x].append(j + 1)
+                    else:
+                        gotos[x] = [j + 1]
+
+            # Number the new sets in the order of all the symbols of the items
+            row = {}
+            for x in dict.fromkeys(s for j in I for s in items[j].usyms):
+                kernel = gotos.get(x)
+                if kernel is None:
                     continue
-                self.lr0_cidhash[id(g)] = len(C)
-                C.append(g)
+                kernel = tuple(kernel)
+                g = kernels.get(kernel)
+                if g is None:
+                    g = kernels[kernel] = len(C)
+                    C.append(self.lr0_closure(kernel))
+                row[x] = g
+            transitions.append(row)
 
-        return C
+        return [ [ items[j] for j in I ] for I in C ]
 
     # -----------------------------------------------------------------------------
     #                       ==== LALR(1) Parsing ====
@@ -1126,15 +1262,14 @@ class LRTable(object):
     # -----------------------------------------------------------------------------
 
     def find_nonterminal_transitions(self, C):
-        trans = []
+        trans = {}
         for stateno, state in enumerate(C):
             for p in state:
                 if p.lr_index < p.len - 1:
                     t = (stateno, p.prod[p.lr_index+1])
                     if t[1] in self.grammar.Nonterminals:
-                        if t not in trans:
-                            trans.append(t)
-        return trans
+                        trans[t] = None
+        return list(trans)
 
     # -----------------------------------------------------------------------------
     # dr_relation()
@@ -1142,25 +1277,24 @@ class LRTable(object):
     # Computes the DR(p,A) relationships for non-terminal transitions.  The input
     # is a tuple (state,N) where state is a number and N is a nonterminal symbol.
     #
-    # Returns a list of terminals.
+    # Returns a set of terminals, as a bitset (see lr_terminal_bits).
     # -----------------------------------------------------------------------------
 
     def dr_relation(self, C, trans, nullable):
-        dr_set = {}
+        bits = self.lr_terminal_bits
         state, N = trans
-        terms = []
+        terms = 0
 
-        g = self.lr0_goto(C[state], N)
-        for p in g:
+        g = self.lr0_goto(state, N)
+        for p in C[g]:
             if p.lr_index < p.len - 1:
                 a = p.prod[p.lr_index+1]
                 if a in self.grammar.Terminals:
-                    if a not in terms:
-                        terms.append(a)
+                    terms |= bits[a]
 
         # This extra bit is to handle the start state
         if state == 0 and N == self.grammar.Productions[0].prod[0]:
-            terms.append('$end')
+            terms |= bits['$end']
 
         return terms
 
@@ -1175,9 +1309,8 @@ class LRTable(object):
         rel = []
         state, N = trans
 
-        g = self.lr0_goto(C[state], N)
-        j = self.lr0_cidhash.get(id(g), -1)
-        for p in g:
+        j = self.lr0_goto(state, N)
+        for p in C[j]:
             if p.lr_index < p.len - 1:
                 a = p.prod[p.lr_index + 1]
                 if a in empty:
@@ -1216,63 +1349,60 @@ class LRTable(object):
     def compute_lookback_includes(self, C, trans, nullable):
         lookdict = {}          # Dictionary of lookback relations
         includedict = {}       # Dictionary of include relations
+        items = self.grammar.LRItems
+        transitions = self.lr0_transitions
 
         # Make a dictionary of non-terminal transitions
         dtrans = {}
         for t in trans:
             dtrans[t] = 1
 
+        # For each production, whether the symbols from position i to the end
+        # all derive empty, for i = 0 ... len
+        empty_rest = []
+        for p in self.grammar.Productions:
+            rest = [True]
+            for s in reversed(p.prod):
+                rest.append(rest[-1] and s in nullable)
+            rest.reverse()
+            empty_rest.append(rest)
+
+        # The items of each state, by name of the production
+        named = []
+        for I in C:
+            names = defaultdict(list)
+            for p in I:
+                names[p.name].append(p)
+            named.append(names)
+
         # Loop over all transitions and compute lookbacks and includes
         for state, N in trans:
             lookb = []
             includes = []
-            for p in C[state]:
-                if p.name != N:
-                    continue
-
+            for p in named[state][N]:
                 # Okay, we have a name match.  We now follow the production all the way
                 # through the state machine until we get the . on the right hand side
 
-                lr_index = p.lr_index
+                prod = self.grammar.Productions[p.number].prod
+                rest = empty_rest[p.number]
                 j = state
-                while lr_index < p.len - 1:
-                    lr_index = lr_index + 1
-                    t = p.prod[lr_index]
-
-                    # Check to see if this symbol and state are a non-terminal transition
-                    if (j, t) in dtrans:
-                        # Yes.  Okay, there is some chance that this is an includes relation
-                        # the only way to know for certain is whether the rest of the
-                        # production derives empty
-
-                        li = lr_index + 1
-                        while li < p.len:
-                            if p.prod[li] in self.grammar.Terminals:
-                                break      # No forget it
-                            if p.prod[li] not in nullable:
-                                break
-                            li = li + 1
-                        else:
-                            # Appears to be a relation between (j,t) and (state,N)
-                            includes.append((j, t))
-
-                    g = self.lr0_goto(C[j], t)               # Go to next set
-                    j = self.lr0_cidhash.get(id(g), -1)      # Go to next state
-
-                # When we get here, j is the final state, now we have to locate the production
-                for r in C[j]:
-                    if r.name != p.name:
-                        continue
-                    if r.len != p.len:
-                        continue
-                    i = 0
-                    # This look is comparing a production ". A B C" with "A B C ."
-                    while i < r.lr_index:
-                        if r.prod[i] != p.prod[i+1]:
-                            break
-                        i = i + 1
-                    else:
-                        lookb.append((j, r))
+                for lr_index in range(p.lr_index, len(prod)):
+                    t = prod[lr_index]
+
+                    # Check to see if this symbol and state are a non-terminal transition.
+                    # If so, it is an includes relation when the rest of the production
+                    # derives empty
+                    if rest[lr_index + 1] and (j, t) in dtrans:
+                        # Appears to be a relation between (j,t) and (state,N)
+                        includes.append((j, t))
+
+                    j = transitions[j][t]                    # Go to next state
+
+                # When we get here, j is the final state.  A production ". A B C"
+                # looks back to its item "A B C ." there, which follows it in the
+                # numbering of the items
+                if p.lr_index == 0:
+                    lookb.append((j, items[p.lr_number + p.len - 1]))
             for i in includes:
                 if i not in includedict:
                     includedict[i] = []
@@ -1334,15 +1464,16 @@ class LRTable(object):
     # -----------------------------------------------------------------------------
 
     def add_lookaheads(self, lookbacks, followset):
+        # Collect the lookaheads as bitsets, then turn them into lists
+        bitsets = {}
         for trans, lb in lookbacks.items():
+            f = followset.get(trans, 0)
             # Loop over productions in lookback
             for state, p in lb:
-                if state not in p.lookaheads:
-                    p.lookaheads[state] = []
-                f = followset.get(trans, [])
-                for a in f:
-                    if a not in p.lookaheads[state]:
-                        p.lookaheads[state].append(a)
+                bitsets[state, p] = bitsets.get((state, p), 0) | f
+
+        for (state, p), f in bitsets.items():
+            p.lookaheads[state] = _bit_symbols(f, self.lr_terminals)
 
     # -----------------------------------------------------------------------------
     # add_lalr_lookaheads()
@@ -1352,6 +1483,10 @@ class LRTable(object):
     # -----------------------------------------------------------------------------
 
     def add_lalr_lookaheads(self, C):
+        # Sets of terminals are bitsets, with bit n for lr_terminals[n]
+        self.lr_terminals = [*self.grammar.Terminals, '$end']
+        self.lr_terminal_bits = { a: 1 << n for n, a in enumerate(self.lr_terminals) }
+
         # Determine all of the nullable nonterminals
         nullable = self.compute_nullable_nonterminals()
 
@@ -1468,8 +1603,7 @@ class LRTable(object):
                         i = p.lr_index
                         a = p.prod[i+1]       # Get symbol right after the "."
                         if a in self.grammar.Terminals:
-                            g = self.lr0_goto(I, a)
-                            j = self.lr0_cidhash.get(id(g), -1)
+                            j = self.lr0_goto(st, a)
                             if j >= 0:
                                 # We are in a shift state
                                 actlist.append((a, p, f'shift and go to state {j}'))
@@ -1518,15 +1652,8 @@ class LRTable(object):
             descrip.append('')
 
             # Construct the goto table for this state
-            nkeys = {}
-            for ii in I:
-                for s in ii.usyms:
-                    if s in self.grammar.Nonterminals:
-                        nkeys[s] = None
-            for n in nkeys:
-                g = self.lr0_goto(I, n)
-                j = self.lr0_cidhash.get(id(g), -1)
-                if j >= 0:
+            for n, j in self.lr0_transitions[st].items():
+                if n in self.grammar.Nonterminals:
                     st_goto[n] = j
                     descrip.append(f'    {n:<30s} shift and go to state {j}')
 
@@ -1823,6 +1950,14 @@ class ParserMeta(type):
 class Parser(metaclass=ParserMeta):
     # Automatic tracking of position information
     track_positions = True
+
+    # Don't reduce by unit rules (a : b) whose function does nothing.  The
+    # symbol b then stands for a, with its own value instead of None
+    skip_unit_rules = False
+
+    # Parse with integer-indexed packed tables instead of dictionaries keyed
+    # by symbol name.  They take much less memory, but parsing is slightly slower
+    compact_tables = False
     
     # Logging object where debugging/diagnostic messages are sent
     log = SlyLogger(sys.stderr)     
@@ -2027,6 +2162,12 @@ class Parser(metaclass=ParserMeta):
                 f.write(str(cls._lrtable))
             cls.log.info('Parser debugging for %s written to %s', cls.__qualname__, cls.debugfile)
 
+        if cls.skip_unit_rules:
+            cls._lrtable.eliminate_unit_rules()
+
+        if cls.compact_tables:
+            cls._lrtable.compact()
+
     # ----------------------------------------------------------------------
     # Parsing Support.  This is the parsing runtime that users use to
     # ----------------------------------------------------------------------
@@ -2063,36 +2204,59 @@ class Parser(metaclass=ParserMeta):
 
     def parse(self, tokens):
         '''
-        Parse the given input tokens.
+        Parse the given input tokens, an iterable of tokens such as
+        Lexer.tokenize() or the TokenArrays of Lexer.tokenize_all().
+        The symbol stack, and the positions kept on its symbols, are
+        dropped when it returns.
         '''
+        try:
+            return self._parse(tokens)
+        finally:
+            self.symstack = []
+            self.statestack = []
+
+    def _parse(self, tokens):
+        tokens = iter(tokens)
         lookahead = None                                  # Current lookahead symbol
         lookaheadstack = []                               # Stack of lookahead symbols
-        actions = self._lrtable.lr_action                 # Local reference to action table (to avoid lookup on self.)
-        goto    = self._lrtable.lr_goto                   # Local reference to goto table (to avoid lookup on self.)
+        lrtable = self._lrtable
+        actions = lrtable.lr_action                       # Local reference to action table (to avoid lookup on self.)
+        goto    = lrtable.lr_goto                         # Local reference to goto table (to avoid lookup on self.)
+        compact = actions is None                         # Packed tables instead (compact_tables)
+        if compact:
+            symbol_index = lrtable.symbol_index           # Symbol name -> number in the packed tables
+            unknown = lrtable.unknown_symbol              # Symbol number of token types not in the grammar
+            action_base  = lrtable.action_base
+            action_check = lrtable.action_check
+            action_next  = lrtable.action_next
+            goto_base    = lrtable.goto_base
+            goto_next    = lrtable.goto_next
+            lhs     = lrtable.lr_lhs                      # Left side symbol number of each production
         prod    = self._grammar.Productions               # Local reference to production list (to avoid lookup on self.)
         defaulted_states = self._lrtable.defaulted_states # Local reference to defaulted states
-        pslice  = YaccProduction(None)                    # Production object passed to grammar rules
         errorcount = 0                                    # Used during error recovery
 
         # Set up the state and symbol stacks
         self.tokens = tokens
         self.statestack = statestack = []                 # Stack of parsing states
         self.symstack = symstack = []                     # Stack of grammar symbols
-        pslice._stack = symstack                          # Associate the stack with the production
         self.restart()
 
-        # Set up position tracking
+        # Production objects passed to grammar rules, one per production,
+        # all reading the symbol stack
+        pslices = [ p.pslice_class(symstack) for p in prod ]
+
+        # Set up position tracking.  Positions are kept on the symbols only,
+        # so they are freed with them and nothing outlives the parse
         track_positions = self.track_positions
-        if not hasattr(self, '_line_positions'):
-            self._line_positions = { }           # id: -> lineno
-            self._index_positions = { }          # id: -> (start, end)
 
         errtoken   = None                                 # Err token
+        state = self.state                                # Current state (self.state is only set for error())
         while True:
             # Get the next symbol on the input.  If a lookahead symbol
             # is already set, we just use that. Otherwise, we'll pull
             # the next token off of the lookaheadstack or from the lexer
-            if self.state not in defaulted_states:
+            if state not in defaulted_states:
                 if not lookahead:
                     if not lookaheadstack:
                         lookahead = next(tokens, None)  # Get the next token
@@ -2103,16 +2267,19 @@ class Parser(metaclass=ParserMeta):
                         lookahead.type = '$end'
                     
                 # Check the action table
-                ltype = lookahead.type
-                t = actions[self.state].get(ltype)
+                if compact:
+                    k = action_base[state] + symbol_index.get(lookahead.type, unknown)
+                    t = action_next[k] if action_check[k] == state else None
+                else:
+                    t = actions[state].get(lookahead.type)
             else:
-                t = defaulted_states[self.state]
+                t = defaulted_states[state]
 
             if t is not None:
                 if t > 0:
                     # shift a symbol on the stack
                     statestack.append(t)
-                    self.state = t
+                    state = t
 
                     symstack.append(lookahead)
                     lookahead = None
@@ -2127,16 +2294,14 @@ class Parser(metaclass=ParserMeta):
                     self.production = p = prod[-t]
                     pname = p.name
                     plen  = p.len
-                    pslice._namemap = p.namemap
+                    pslice = pslices[-t]
 
                     # Call the production function
-                    pslice._slice = symstack[-plen:] if plen else []
-
                     sym = YaccSymbol()
                     sym.type = pname       
                     value = p.func(self, pslice)
                     if value is pslice:
-                        value = (pname, *(s.value for s in pslice._slice))
+                        value = (pname, *(s.value for s in symstack[len(symstack)-plen:]))
 
                     sym.value = value
                         
@@ -2151,16 +2316,17 @@ class Parser(metaclass=ParserMeta):
                             sym.lineno = None
                             sym.index = None
                             sym.end = None
-                        self._line_positions[id(value)] = sym.lineno
-                        self._index_positions[id(value)] = (sym.index, sym.end)
-                            
+
                     if plen:
                         del symstack[-plen:]
                         del statestack[-plen:]
 
                     symstack.append(sym)
-                    self.state = goto[statestack[-1]][pname]
-                    statestack.append(self.state)
+                    if compact:
+                        state = goto_next[goto_base[statestack[-1]] + lhs[-t]]
+                    else:
+                        state = goto[statestack[-1]][pname]
+                    statestack.append(state)
                     continue
 
                 if t == 0:
@@ -2187,7 +2353,9 @@ class Parser(metaclass=ParserMeta):
                     else:
                         errtoken = lookahead
 
+                    self.state = state
                     tok = self.error(errtoken)
+                    state = self.state
                     if tok:
                         # User must have done some kind of panic
                         # mode recovery on their own.  The
@@ -2209,7 +2377,7 @@ class Parser(metaclass=ParserMeta):
 
                 if len(statestack) <= 1 and lookahead.type != '$end':
                     lookahead = None
-                    self.state = 0
+                    state = 0
                     # Nuke the lookahead stack
                     del lookaheadstack[:]
                     continue
@@ -2246,16 +2414,33 @@ class Parser(metaclass=ParserMeta):
                 else:
                     sym = symstack.pop()
                     statestack.pop()
-                    self.state = statestack[-1]
+                    state = statestack[-1]
                 continue
 
             # Call an error function here
             raise RuntimeError('sly: internal parser error!!!\n')
 
-    # Return position tracking information
+    def _stack_symbol(self, value):
+        # The topmost symbol on the stack with this value
+        for sym in reversed(self.symstack[1:]):           # [0] is the $end bottom
+            if sym.value is value:
+                return sym
+        raise KeyError(value)
+
     def line_position(self, value):
-        return self._line_positions[id(value)]
+        '''
+        Return the line number of the symbol whose value is value.  Only
+        the values on the symbol stack are known, such as the values of
+        the symbols of the rule being reduced: a value nested in another
+        one, or any value once parse() has returned, raises KeyError.
+        '''
+        return self._stack_symbol(value).lineno
 
     def index_position(self, value):
-        return self._index_positions[id(value)]
+        '''
+        Return the (start, end) indexes of the symbol whose value is value,
+        with the same limits as line_position().
+        '''
+        sym = self._stack_symbol(value)
+        return (sym.index, sym.end)
     
@@ -0,0 +1,10 @@
+// result: 4
+
+#include <stdio.h>
+
+int main() {
+    int n = 5;
+    int a[n];
+    a[n - 1] = n - 1;
+    printf("%d\n", a[n - 1]);
+}
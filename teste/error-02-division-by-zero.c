@@ -0,0 +1,10 @@
+// runtime error: division by zero, with lists, --compact-arrays and
+// --numpy-arrays alike
+
+#include <stdio.h>
+
+int main() {
+    int a[] = {4, 6, 8};
+    int z = 0;
+    printf("%d\n", a[1] / z);   // error: ZeroDivisionError
+}
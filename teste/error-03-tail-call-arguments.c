@@ -0,0 +1,15 @@
+// runtime error: TypeError, bad() takes 1 argument but is called with 2,
+// also with -O (the call is not made a jump)
+
+#include <stdio.h>
+
+int bad(int n) {
+    if (n == 0) {
+        return 0;
+    }
+    return bad(n - 1, 5);
+}
+
+int main() {
+    printf("%d\n", bad(3));
+}
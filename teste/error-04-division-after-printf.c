@@ -0,0 +1,17 @@
+// runtime error: prints 1, then ZeroDivisionError, also with -O (the
+// division is not computed before the loop)
+
+#include <stdio.h>
+
+int main() {
+    int a = 6;
+    int z = 0;
+    int i = 1;
+    int x = 0;
+    while (i < 3) {
+        printf("%d\n", i);
+        x = a / z;
+        i = i + 1;
+    }
+    printf("%d\n", x);
+}
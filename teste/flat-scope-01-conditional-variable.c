@@ -0,0 +1,22 @@
+// result: 3
+
+// not C: Ç variables are local to the function, not to the block that
+// declares them, so x is known after the if even when it was not stored.
+// -O must not compute x * 2 before the loop
+
+#include <stdio.h>
+
+int main() {
+    int c = 0;
+    int i = 0;
+    if (c == 1) {
+        int x = 3;
+    }
+    while (i < 3) {
+        if (c == 1) {
+            printf("%d\n", x * 2);
+        }
+        i = i + 1;
+    }
+    printf("%d\n", i);
+}